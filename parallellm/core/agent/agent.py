@@ -112,9 +112,10 @@ class AgentContext(Askable):
         self._anonymous_counter += 1
 
         if isinstance(documents, MessageState):
-            documents = documents.cast_documents() + list(additional_documents)
+            documents = documents.cast_documents()
+            documents.extend(additional_documents)
         else:
-            documents = cast_documents(documents, list(additional_documents))
+            documents = cast_documents(documents, additional_documents)
 
         # Compute salt
         salt_terms = []
@@ -127,7 +128,10 @@ class AgentContext(Askable):
                         salt_terms.append(llm.identity)
                     else:
                         salt_terms.append(self._bm._provider.provider_type)
-        hashed = compute_hash(instructions, documents + salt_terms)
+        # Salt terms only affect the hash, not the documents sent
+        hashed = compute_hash(
+            instructions, documents + salt_terms if salt_terms else documents
+        )
 
         call_id: CallIdentifier = {
             "agent_name": self.agent_name,
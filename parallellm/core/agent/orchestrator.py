@@ -62,8 +62,11 @@ class AgentOrchestrator:
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        """Exit the context manager, automatically calling persist()."""
-        self.persist()
+        """Exit the context manager, automatically calling persist() and closing the backend."""
+        try:
+            self.persist()
+        finally:
+            self._backend.close()
         return False
 
     def agent(
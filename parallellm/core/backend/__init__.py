@@ -8,6 +8,8 @@ class BaseBackend:
     A backend is a data store, but also a way to poll
     """
 
+    __slots__ = ()
+
     async def _poll_changes(self, call_id: CallIdentifier):
         """
         A chance to poll for changes and update the data store
@@ -18,6 +20,19 @@ class BaseBackend:
         """Persist data and clean up resources"""
         pass
 
+    def close(self):
+        """Release resources held by the backend"""
+        pass
+
+    def __enter__(self):
+        """Enter the context manager, returning self."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit the context manager, automatically calling close()."""
+        self.close()
+        return False
+
     def retrieve(
         self, call_id: CallIdentifier, metadata=False
     ) -> Optional[ParsedResponse]:
@@ -6,7 +6,7 @@ import atexit
 from typing import Optional, TYPE_CHECKING
 from parallellm.core.backend import BaseBackend
 from parallellm.core.throttler import Throttler
-from parallellm.core.calls import _call_matches
+from parallellm.core.calls import _call_key, _call_matches
 from parallellm.core.datastore.sqlite import SQLiteDatastore
 from parallellm.core.response import PendingLLMResponse
 from parallellm.file_io.file_manager import FileManager
@@ -14,6 +14,7 @@ from parallellm.logging.dash_logger import (
     DashboardLogger,
     HashStatus,
     PrimitiveDashboardLogger,
+    logs_hashes,
 )
 from parallellm.types import (
     CallIdentifier,
@@ -56,6 +57,7 @@ class AsyncBackend(BaseBackend):
         """
         self._fm = fm
         self.dash_logger = dash_logger
+        self._dashlog_enabled = logs_hashes(dash_logger)
         self._rewrite_cache = rewrite_cache
         self._max_concurrent = max_concurrent
 
@@ -68,6 +70,7 @@ class AsyncBackend(BaseBackend):
                 max_requests_per_window=None,
                 window_seconds=None,
             )
+        self._throttle_enabled = self._throttler.is_enabled()
 
         # These should ONLY be accessed from the event loop thread
         self.tasks: list[asyncio.Task] = []
@@ -142,12 +145,11 @@ class AsyncBackend(BaseBackend):
 
     async def _apply_throttling(self) -> None:
         """Apply throttling by waiting if necessary"""
-        delay = self._throttler.calculate_delay()
-        if delay > 0:
+        if not self._throttle_enabled:
+            return
+        # calculate_delay() records the request once there is room in the window
+        while (delay := self._throttler.calculate_delay()) > 0:
             await asyncio.sleep(delay)
-            # After waiting, record the actual submission time
-            if self._throttler.is_enabled():
-                self._throttler.record_request()
 
     def submit_query(
         self,
@@ -221,7 +223,8 @@ class AsyncBackend(BaseBackend):
             self._create_and_store_task(call_id, coro, provider), self._loop
         )
 
-        self.dash_logger.update_hash(call_id["doc_hash"], HashStatus.SENT)
+        if self._dashlog_enabled:
+            self.dash_logger.update_hash(call_id["doc_hash"], HashStatus.SENT)
         # Don't wait for the result, just submit it
         return future
 
@@ -262,16 +265,18 @@ class AsyncBackend(BaseBackend):
             done_tasks.append(metadata)
 
             # do logging
-            self.dash_logger.update_hash(call_id["doc_hash"], HashStatus.RECEIVED)
+            if self._dashlog_enabled:
+                self.dash_logger.update_hash(call_id["doc_hash"], HashStatus.RECEIVED)
 
             # Stop if we reached the target
             if until_call_id is not None and _call_matches(until_call_id, call_id):
                 break
 
         # pop completed tasks
+        done_ids = {id(meta) for meta in done_tasks}
         for i in reversed(range(len(self.tasks))):
             meta = self.task_metas[i]
-            if meta in done_tasks:
+            if id(meta) in done_ids:
                 self.tasks.pop(i)
                 self.task_metas.pop(i)
                 # print(f"Completed {meta['doc_hash'][:8]}:{meta['seq_id']}")
@@ -280,7 +285,8 @@ class AsyncBackend(BaseBackend):
         self, call_id: CallIdentifier, metadata=False
     ) -> Optional[ParsedResponse]:
         # only poll for changes if we have a matching task
-        if any(_call_matches(m, call_id) for m in self.task_metas):
+        key = _call_key(call_id)
+        if any(_call_key(m) == key for m in self.task_metas):
             await self._poll_changes(call_id)
         return self._async_ds.retrieve(call_id, metadata=metadata)
 
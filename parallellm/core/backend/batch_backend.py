@@ -1,11 +1,14 @@
-import json
 import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 from pathlib import Path
-from typing import List, Literal, Optional, Union, TYPE_CHECKING
+from typing import Iterable, List, Literal, Optional, Sequence, Union, TYPE_CHECKING
 from parallellm.core.backend import BaseBackend
 from parallellm.core.datastore.sqlite import SQLiteDatastore
 from parallellm.core.exception import NotAvailable
 from parallellm.core.identity import LLMIdentity
+from parallellm.core.throttler import Throttler
 from parallellm.file_io.file_manager import FileManager
 from parallellm.logging.dash_logger import (
     DashboardLogger,
@@ -13,6 +16,7 @@ from parallellm.logging.dash_logger import (
     PrimitiveDashboardLogger,
 )
 from parallellm.provider.base import BatchProvider
+from parallellm.utils.fastjson import dumps_bytes
 from parallellm.types import (
     BatchIdentifier,
     BatchResult,
@@ -27,6 +31,12 @@ if TYPE_CHECKING:
     from parallellm.provider.base import BatchProvider as BatchProviderType
 
 
+def _chunked(seq: Sequence, n: int):
+    """Yield successive slices of `seq` with at most `n` items each."""
+    for i in range(0, len(seq), n):
+        yield seq[i : i + n]
+
+
 class BatchBackend(BaseBackend):
     """
     The batch backend is a bit different: it defers sending out requests
@@ -43,17 +53,52 @@ class BatchBackend(BaseBackend):
         session_id: int,
         confirm_batch_submission: bool = False,
         rewrite_cache: bool = False,
+        submission_tps: Optional[float] = None,
     ):
+        """
+        Initialize the BatchBackend.
+
+        :param fm: FileManager for data persistence
+        :param dash_logger: Optional dashboard logger for monitoring
+        :param datastore_cls: Custom datastore class (defaults to SQLiteDatastore)
+        :param session_id: The current session counter
+        :param confirm_batch_submission: Whether to ask before submitting batches
+        :param rewrite_cache: Whether to overwrite existing cache entries
+        :param submission_tps: Maximum batch submissions per second (None = no limit)
+        """
+        if submission_tps is not None and submission_tps <= 0:
+            raise ValueError(f"submission_tps must be positive, got {submission_tps}")
         self._fm = fm
         if datastore_cls is None:
             self._ds = SQLiteDatastore(fm)
         else:
             self._ds = datastore_cls(fm)
+        self._closed = False
         self.dash_logger = dash_logger
         self._confirm_batch_submission = confirm_batch_submission
         self._rewrite_cache = rewrite_cache
 
-        self._batch_buffer: list[tuple[CallIdentifier, dict]] = []
+        # None = submissions are not rate limited
+        self._submission_throttler: Optional[Throttler] = None
+        if submission_tps is not None:
+            # Allow bursts of up to one second's worth of submissions
+            burst = max(1, int(submission_tps))
+            self._submission_throttler = Throttler(
+                max_requests_per_window=burst,
+                window_seconds=burst / submission_tps,
+            )
+
+        # Calls waiting to be batched, as parallel lists
+        self._batch_call_ids: list[CallIdentifier] = []
+        self._batch_model_names: list[str] = []
+        self._batch_stuff: list[dict] = []
+        self._precheck_queue: list[tuple[CallIdentifier, str, dict]] = []
+        "Calls not yet checked against pending batches; checked together on flush."
+        self._precheck_flush_size = 128
+        self._pending_keys: Optional[set[tuple[Optional[str], str]]] = None
+        "(agent_name, doc_hash) of calls known to be in pending batches; loaded on first flush."
+        self._buffered_keys: set[tuple[Optional[str], str, int]] = set()
+        "(agent_name, doc_hash, seq_id) of calls submitted since the last executed batch."
         self.session_id = session_id
 
         self._private_increment = 0
@@ -71,6 +116,11 @@ class BatchBackend(BaseBackend):
         This inverts control from provider calling backend.
         """
 
+        # The same call was already submitted this session; don't pay for it twice
+        key = (call_id["agent_name"], call_id["doc_hash"], call_id["seq_id"])
+        if key in self._buffered_keys:
+            raise NotAvailable()
+
         # Get the batch call data from the provider
         stuff = provider.prepare_batch_call(
             params,
@@ -84,6 +134,8 @@ class BatchBackend(BaseBackend):
             params["llm"],
             stuff=stuff,
         )
+        # Only once buffered; a call that failed to prepare may be retried
+        self._buffered_keys.add(key)
 
         # Batch values are always unavailable
         raise NotAvailable()
@@ -100,17 +152,11 @@ class BatchBackend(BaseBackend):
         return self._ds.retrieve(call_id, metadata=metadata)
 
     def close(self):
-        """Clean up resources"""
-        if hasattr(self._ds, "close"):
-            self._ds.close()
-
-    def __del__(self):
-        """Clean up resources when the SyncBackend is destroyed"""
-        try:
-            self.close()
-        except Exception:
-            # Ignore errors during cleanup in destructor
-            pass
+        """Clean up resources. Only the first call has any effect."""
+        if self._closed:
+            return
+        self._closed = True
+        self._ds.close()
 
     def bookkeep_call(
         self,
@@ -126,12 +172,45 @@ class BatchBackend(BaseBackend):
 
         :raises NotAvailable: If the call_id is already in a pending batch
         """
-        # If call is already in a pending batch,
-        # do not add it again
-        if self._ds.is_call_in_pending_batch(call_id):
+        self._precheck_queue.append((call_id, llm.model_name, stuff))
+        if len(self._precheck_queue) >= self._precheck_flush_size:
+            self._flush_precheck_queue()
+
+    def _flush_precheck_queue(self):
+        """
+        Move queued calls into the batch buffer,
+        skipping those that are already in a pending batch.
+        """
+        if not self._precheck_queue:
             return
 
-        self._batch_buffer.append((call_id, llm.model_name, stuff))
+        queued = self._precheck_queue
+        self._precheck_queue = []
+
+        if self._pending_keys is None:
+            self._pending_keys = self._ds.get_all_pending_call_keys()
+
+        # If call is already in a pending batch, do not add it again.
+        # Only calls with a known pending key need to be confirmed against
+        # the datastore, since keys may be stale once batches are downloaded.
+        candidates = [
+            i
+            for i, (call_id, _, _) in enumerate(queued)
+            if (call_id["agent_name"], call_id["doc_hash"]) in self._pending_keys
+        ]
+        skip = set()
+        if candidates:
+            is_pending = self._ds.is_call_in_pending_batch_many(
+                [queued[i][0] for i in candidates]
+            )
+            skip = {i for i, pending in zip(candidates, is_pending) if pending}
+
+        for i, (call_id, model_name, stuff) in enumerate(queued):
+            if i in skip:
+                continue
+            self._batch_call_ids.append(call_id)
+            self._batch_model_names.append(model_name)
+            self._batch_stuff.append(stuff)
 
     def generate_custom_id(
         self,
@@ -155,59 +234,55 @@ class BatchBackend(BaseBackend):
         *,
         max_batch_size=1000,
         partition_by_model_name=True,
+        max_workers: int = 8,
     ) -> CohortIdentifier:
-        """Execute the batch of calls"""
+        """
+        Execute the batch of calls
+
+        :param max_workers: Maximum number of batches submitted concurrently
+        """
 
-        if not self._batch_buffer:
+        self._flush_precheck_queue()
+        if not self._batch_call_ids:
             return CohortIdentifier(batch_ids=[], session_id=self.session_id)
 
         # 1. Split based on model_name
         # Many batch APIs (like OpenAI's) require the same model across the entire batch
-        index_groups: list[list[int]] = []  # list of groups of indices
+        index_groups: list[Sequence[int]] = []  # list of groups of indices
         if partition_by_model_name:
-            mn2b = {}
-            for i, (call_id, model_name, stuff) in enumerate(self._batch_buffer):
-                if model_name not in mn2b:
-                    mn2b[model_name] = []
+            mn2b = defaultdict(list)
+            for i, model_name in enumerate(self._batch_model_names):
                 mn2b[model_name].append(i)
             index_groups = list(mn2b.values())
         else:
-            index_groups = [list(range(len(self._batch_buffer)))]
+            index_groups = [range(len(self._batch_call_ids))]
 
         # 2. Split into groups of max_batch_size
-        _bdr = []
-        for batch in index_groups:
-            if len(batch) <= max_batch_size:
-                _bdr.append(batch)
-            else:
-                for i in range(0, len(batch), max_batch_size):
-                    _bdr.append(batch[i : i + max_batch_size])
-        index_groups = _bdr
+        chunked_groups = chain.from_iterable(
+            _chunked(batch, max_batch_size) for batch in index_groups
+        )
 
-        # dict with keys: call_ids, model_name, stuff, custom_ids
+        # dict with keys: indices, call_ids, model_name, data, custom_ids
         batches: list[dict] = []
-        for index_gp in index_groups:
-            rowwise = {
-                "call_ids": [],
-                "model_name": None,
-                "data": [],
-                "custom_ids": [],
-            }
-            for i in index_gp:
-                call_id, model_name, stuff = self._batch_buffer[i]
-                rowwise["call_ids"].append(call_id)
-                rowwise["model_name"] = model_name
-                rowwise["data"].append(stuff)
-            rowwise["custom_ids"] = provider.get_batch_custom_ids(rowwise["data"])
-            batches.append(rowwise)
+        for index_gp in chunked_groups:
+            data = [self._batch_stuff[i] for i in index_gp]
+            batches.append(
+                {
+                    "indices": index_gp,
+                    "call_ids": [self._batch_call_ids[i] for i in index_gp],
+                    "model_name": self._batch_model_names[index_gp[-1]],
+                    "data": data,
+                    "custom_ids": provider.get_batch_custom_ids(data),
+                }
+            )
 
         pending_fpaths = []
 
         # Ask for confirmation if requested
         _saved_already = False
         if self._confirm_batch_submission:
-            total_calls = sum(len(batch) for batch in index_groups)
-            num_batches = len(index_groups)
+            total_calls = sum(len(record["call_ids"]) for record in batches)
+            num_batches = len(batches)
 
             confirmed = special_dl.confirm_batch_submission(num_batches, total_calls)
 
@@ -232,33 +307,84 @@ class BatchBackend(BaseBackend):
                 fpath = self._fm.save_batch_in(record["data"])
                 pending_fpaths.append(fpath)
 
-        # 3. Submit each batch
-        batch_ids = []
-        for fpath, record in zip(pending_fpaths, batches):
-            batch_uuid = provider.submit_batch_to_provider(fpath, record["model_name"])
-            ident = BatchIdentifier(
-                call_ids=record["call_ids"],
-                custom_ids=record["custom_ids"],
-                batch_uuid=batch_uuid,
-            )
-            self._ds.store_pending_batch(ident)
-            batch_ids.append(ident)
+        # 3. Submit each batch concurrently, keeping the original order
+        results: list[Optional[BatchIdentifier]] = [None] * len(batches)
+        error = None
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+            futures = {
+                pool.submit(
+                    self._submit_batch, provider, fpath, record["model_name"]
+                ): i
+                for i, (fpath, record) in enumerate(zip(pending_fpaths, batches))
+            }
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    batch_uuid = fut.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                    continue
+                results[i] = BatchIdentifier(
+                    call_ids=batches[i]["call_ids"],
+                    custom_ids=batches[i]["custom_ids"],
+                    batch_uuid=batch_uuid,
+                )
+        batch_ids = [ident for ident in results if ident is not None]
+
+        # Record everything that was actually submitted, in one transaction
+        if batch_ids:
+            self._ds.store_pending_batch_many(batch_ids)
+            if self._pending_keys is not None:
+                self._pending_keys.update(
+                    (c["agent_name"], c["doc_hash"])
+                    for batch_id in batch_ids
+                    for c in batch_id.call_ids
+                )
 
+        for ident in batch_ids:
             # Log batch submission to dashboard
-            special_dl.update_hash(batch_uuid, HashStatus.SENT_BATCH)
+            special_dl.update_hash(ident.batch_uuid, HashStatus.SENT_BATCH)
             special_dl.cprint("Sent batch:", ident.batch_uuid)
 
+        if error is not None:
+            # Keep only the calls that were not submitted, so a retry doesn't pay twice
+            submitted = {
+                i
+                for record, ident in zip(batches, results)
+                if ident is not None
+                for i in record["indices"]
+            }
+            keep = [i for i in range(len(self._batch_call_ids)) if i not in submitted]
+            self._batch_call_ids = [self._batch_call_ids[i] for i in keep]
+            self._batch_model_names = [self._batch_model_names[i] for i in keep]
+            self._batch_stuff = [self._batch_stuff[i] for i in keep]
+            self._buffered_keys = {
+                (c["agent_name"], c["doc_hash"], c["seq_id"])
+                for c in self._batch_call_ids
+            }
+            raise error
+
         cohort_id = CohortIdentifier(batch_ids=batch_ids, session_id=self.session_id)
         # Clear the batch buffer after execution
-        self._batch_buffer.clear()
+        self._batch_call_ids.clear()
+        self._batch_model_names.clear()
+        self._batch_stuff.clear()
+        self._buffered_keys.clear()
         return cohort_id
 
+    def _submit_batch(self, provider: "BatchProvider", fpath: Path, model_name: str):
+        """Submit a single batch file, respecting the submission rate limit"""
+        if self._submission_throttler is not None:
+            self._submission_throttler.acquire()
+        return provider.submit_batch_to_provider(fpath, model_name)
+
     def persist(self):
         """Persist any remaining data and datastore"""
         self._ds.persist()
 
     def persist_to_zip(
-        self, stuff: Union[str, list[dict]], fpath: Path, *, inner_fname: str = None
+        self, stuff: Union[str, Iterable[dict]], fpath: Path, *, inner_fname: str = None
     ) -> None:
         """
         Helper function to persist anything to a zip file.
@@ -268,19 +394,30 @@ class BatchBackend(BaseBackend):
         :param inner_fname: The name of the file inside the zip.
             If not given, then `fpath` minus ".zip".
         """
+        import io
         import zipfile
 
-        with zipfile.ZipFile(fpath, "w") as zf:
+        with zipfile.ZipFile(
+            fpath,
+            "w",
+            compression=zipfile.ZIP_DEFLATED,
+            compresslevel=1,
+            allowZip64=True,
+        ) as zf:
             if inner_fname is None:
                 inner_fname = fpath.stem
             if isinstance(stuff, str):
-                zf.writestr(inner_fname, stuff)
+                # encode in slices, rather than copying the whole string at once
+                with zf.open(inner_fname, "w") as f:
+                    for i in range(0, len(stuff), 1 << 20):
+                        f.write(stuff[i : i + (1 << 20)].encode("utf-8"))
             else:
                 # write a jsonl
-                with zf.open(inner_fname + ".jsonl", "w") as f:
-                    for item in stuff:
-                        line = json.dumps(item) + "\n"
-                        f.write(line.encode("utf-8"))
+                with zf.open(inner_fname + ".jsonl", "w") as raw:
+                    with io.BufferedWriter(raw, buffer_size=1 << 20) as f:
+                        for item in stuff:
+                            f.write(dumps_bytes(item))
+                            f.write(b"\n")
 
     # TODO: Also need to store the batch_uuid
     # In that datastore, we need to store
@@ -314,15 +451,10 @@ class BatchBackend(BaseBackend):
 
         batch_results = provider.download_batch(batch_uuid)
 
-        for res in batch_results:
-            if save_to_disk == "zip":
-                ending = ".zip" if res.status == "ready" else "_err.zip"
-                batch_fname = os.path.basename(batch_uuid)
-                fpath = self._fm.allocate_batch_out() / f"{batch_fname}{ending}"
-                self.persist_to_zip(
-                    res.raw_output, fpath=fpath, inner_fname=batch_uuid + ".jsonl"
-                )
+        if save_to_disk == "zip":
+            self._archive_batch_results(batch_uuid, batch_results)
 
+        for res in batch_results:
             if res.status == "ready":
                 self._ds.store_ready_batch(res, upsert=self._rewrite_cache)
                 # Log batch storage to dashboard
@@ -334,13 +466,36 @@ class BatchBackend(BaseBackend):
                 pass
         return batch_results
 
+    def _archive_batch_results(
+        self, batch_uuid: str, batch_results: List[BatchResult]
+    ) -> None:
+        """
+        Save the raw output of downloaded batch results to zip files.
+
+        :param batch_uuid: The UUID of the batch the results belong to.
+        :param batch_results: The results returned by the provider.
+        """
+        for res in batch_results:
+            ending = ".zip" if res.status == "ready" else "_err.zip"
+            batch_fname = os.path.basename(batch_uuid)
+            fpath = self._fm.allocate_batch_out() / f"{batch_fname}{ending}"
+            self.persist_to_zip(
+                res.raw_output, fpath=fpath, inner_fname=batch_uuid + ".jsonl"
+            )
+
     def try_download_all_batches(
         self,
         provider: "BatchProvider",
         special_dl: DashboardLogger,
+        *,
+        max_workers: int = 8,
     ):
         """
         Try to download all batches and clean up completed ones
+
+        Downloads run concurrently; results are stored from the calling thread.
+
+        :param max_workers: Maximum number of batches downloaded at once.
         """
         pending_batches = self._ds.get_all_pending_batch_uuids()
 
@@ -349,30 +504,57 @@ class BatchBackend(BaseBackend):
             "ready": 0,
             "error": 0,
         }
-        for batch_uuid in pending_batches:
-            batch_results = self.download_batch_from_provider(
-                provider, batch_uuid, save_to_disk="zip"
-            )
+        if not pending_batches:
+            return statuses
+
+        finished: dict[str, List[BatchResult]] = {}
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(pending_batches))
+        ) as executor:
+            futures = {
+                executor.submit(provider.download_batch, batch_uuid): batch_uuid
+                for batch_uuid in pending_batches
+            }
+            for future in as_completed(futures):
+                batch_uuid = futures[future]
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    # Leave the batch pending, so a later round can retry it
+                    special_dl.cprint(f"Batch {batch_uuid} failed to download: {e}")
+                    statuses["error"] += 1
+                    continue
+                self._archive_batch_results(batch_uuid, batch_results)
+
+                if batch_results:
+                    finished[batch_uuid] = batch_results
+                else:
+                    special_dl.update_hash(batch_uuid, HashStatus.SENT_BATCH)
+                    special_dl.cprint(f"Batch {batch_uuid} is still pending.")
+                    statuses["pending"] += 1
+
+        # Store results and clean up the pending batch records (even for errors)
+        # in one transaction. SQLite connections are per-thread, so this runs here.
+        failed = self._ds.finalize_batches(finished, upsert=self._rewrite_cache)
+        for batch_uuid, e in failed.items():
+            # Left pending; the other batches were stored
+            special_dl.cprint(f"Batch {batch_uuid} could not be stored: {e}")
+            statuses["error"] += 1
+
+        for batch_uuid, batch_results in finished.items():
+            if batch_uuid in failed:
+                continue
             for batch_result in batch_results:
                 if batch_result.status == "ready":
                     special_dl.update_hash(batch_uuid, HashStatus.STORED_BATCH)
                     special_dl.cprint(f"Batch {batch_uuid} completed and stored.")
-                    # Clean up the pending batch record
-                    self._ds.clear_batch_pending(batch_uuid)
                     statuses["ready"] += 1
                 elif batch_result.status == "error":
                     special_dl.update_hash(batch_uuid, HashStatus.STORED_ERROR_BATCH)
                     special_dl.cprint(
                         f"Batch {batch_uuid} completed with errors and stored."
                     )
-                    # Clean up the pending batch record even for errors
-                    self._ds.clear_batch_pending(batch_uuid)
                     statuses["error"] += 1
-
-            if not batch_results:
-                special_dl.update_hash(batch_uuid, HashStatus.SENT_BATCH)
-                special_dl.cprint(f"Batch {batch_uuid} is still pending.")
-                statuses["pending"] += 1
         return statuses
 
 
@@ -1,5 +1,10 @@
+import logging
+import queue
+import threading
 import time
-from typing import Optional, List, Dict, Any, TYPE_CHECKING
+import weakref
+from collections import OrderedDict
+from typing import Optional, List, TYPE_CHECKING
 from parallellm.core.backend import BaseBackend
 from parallellm.core.throttler import Throttler
 from parallellm.core.datastore.sqlite import SQLiteDatastore
@@ -9,6 +14,7 @@ from parallellm.logging.dash_logger import (
     DashboardLogger,
     HashStatus,
     PrimitiveDashboardLogger,
+    logs_hashes,
 )
 from parallellm.provider.schemas import guess_schema
 from parallellm.types import (
@@ -17,10 +23,24 @@ from parallellm.types import (
     ParsedResponse,
     CommonQueryParameters,
 )
+from parallellm.utils import fastjson
 
 if TYPE_CHECKING:
     from parallellm.provider.base import SyncProvider
 
+logger = logging.getLogger("parallellm")
+
+
+def _flush_at_exit(ds, write_buffer: list, upsert: bool) -> None:
+    """Write responses still buffered when a SyncBackend is collected or the interpreter exits"""
+    if not write_buffer:
+        return
+    try:
+        ds.store_many(write_buffer, upsert=upsert)
+        write_buffer.clear()
+    except Exception as e:
+        logger.warning(f"Failed to store {len(write_buffer)} buffered responses: {e}")
+
 
 class SyncBackend(BaseBackend):
     """
@@ -28,6 +48,27 @@ class SyncBackend(BaseBackend):
     This backend is simpler and more straightforward for synchronous workflows.
     """
 
+    __slots__ = (
+        "_fm",
+        "_ds",
+        "_dash_logger",
+        "_dashlog_enabled",
+        "_rewrite_cache",
+        "_log_q",
+        "_log_thread",
+        "_throttler",
+        "_throttle_enabled",
+        "_pending_results",
+        "_max_pending_results",
+        "_write_buffer",
+        "_flush_size",
+        "_flush_interval_s",
+        "_last_flush",
+        "_finalizer",
+        "_closed",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         fm: FileManager,
@@ -36,6 +77,8 @@ class SyncBackend(BaseBackend):
         datastore_cls=None,
         rewrite_cache: bool = False,
         throttler=None,
+        flush_size: int = 100,
+        flush_interval_s: float = 1.0,
     ):
         """
         Initialize the SyncBackend.
@@ -45,6 +88,10 @@ class SyncBackend(BaseBackend):
         :param datastore_cls: Custom datastore class (defaults to SQLiteDatastore)
         :param rewrite_cache: Whether to overwrite existing cache entries
         :param throttler: Throttler instance for rate limiting (default: None)
+        :param flush_size: Number of buffered responses that triggers a write to the datastore
+        :param flush_interval_s: Seconds since the last write after which buffered responses are written.
+            Checked on each submit: calls slower than this are written one at a time; faster ones are batched.
+            Anything still buffered is written on close(), persist(), or interpreter exit.
         """
         self._fm = fm
 
@@ -55,6 +102,11 @@ class SyncBackend(BaseBackend):
         self.dash_logger = dash_logger
         self._rewrite_cache = rewrite_cache
 
+        # Dashboard updates are handed to a background thread,
+        # so that console output does not delay the LLM call
+        self._log_q: queue.SimpleQueue = queue.SimpleQueue()
+        self._log_thread: Optional[threading.Thread] = None
+
         # Throttling configuration
         if throttler is not None:
             self._throttler = throttler
@@ -64,18 +116,55 @@ class SyncBackend(BaseBackend):
                 max_requests_per_window=None,
                 window_seconds=None,
             )
+        self._throttle_enabled = self._throttler.is_enabled()
+
+        # Most recent results, keyed by (agent_name, doc_hash, seq_id).
+        # Older ones are evicted and served from the datastore instead.
+        self._pending_results: OrderedDict[tuple, ParsedResponse] = OrderedDict()
+        self._max_pending_results = 1024
+
+        # Responses not yet written to the datastore; written in one transaction on flush
+        self._write_buffer: list[tuple[CallIdentifier, ParsedResponse]] = []
+        self._flush_size = flush_size
+        self._flush_interval_s = flush_interval_s
+        self._last_flush = time.monotonic()
+        # Scripts that never call close() or persist() still get their responses written.
+        # The buffer is only ever modified in place, so the finalizer sees its contents.
+        self._finalizer = weakref.finalize(
+            self, _flush_at_exit, self._ds, self._write_buffer, rewrite_cache
+        )
+        self._closed = False
 
-        # Store results directly instead of managing async tasks
-        self._pending_results: Dict[str, Any] = {}
+    @property
+    def dash_logger(self) -> DashboardLogger:
+        return self._dash_logger
+
+    @dash_logger.setter
+    def dash_logger(self, dash_logger: DashboardLogger) -> None:
+        self._dash_logger = dash_logger
+        # No need to queue updates (or start a thread) for a no-op logger
+        self._dashlog_enabled = logs_hashes(dash_logger)
 
     def _apply_throttling(self) -> None:
         """Apply throttling by waiting if necessary"""
-        delay = self._throttler.calculate_delay()
-        if delay > 0:
-            time.sleep(delay)
-            # After waiting, record the actual submission time
-            if self._throttler.is_enabled():
-                self._throttler.record_request()
+        if self._throttle_enabled:
+            self._throttler.acquire()
+
+    def _log_hash(self, doc_hash: str, status: HashStatus) -> None:
+        """Queue a dashboard update, starting the logging thread if needed"""
+        if not self._dashlog_enabled:
+            return
+        if self._log_thread is None:
+            self._log_thread = threading.Thread(
+                target=self._drain_log_queue, daemon=True
+            )
+            self._log_thread.start()
+        self._log_q.put((doc_hash, status))
+
+    def _drain_log_queue(self) -> None:
+        """Forward queued updates to the dashboard logger until a sentinel is received"""
+        while (item := self._log_q.get()) is not None:
+            self._dash_logger.update_hash(*item)
 
     def submit_query(
         self,
@@ -83,46 +172,102 @@ class SyncBackend(BaseBackend):
         params: CommonQueryParameters,
         *,
         call_id: CallIdentifier,
+        durable: bool = False,
         **kwargs,
     ):
         """
         New control flow: Backend calls provider to get callable, then executes it.
         This inverts control from provider calling backend.
+
+        :param durable: Write the response to the datastore before returning,
+            rather than buffering it. Raises if it cannot be written.
         """
 
         """Submit a synchronous function call and store the result immediately"""
         doc_hash = call_id["doc_hash"]
-        seq_id = call_id["seq_id"]
+        key = (call_id["agent_name"], doc_hash, call_id["seq_id"])
 
         try:
             # Apply throttling before making the request
             self._apply_throttling()
 
-            self.dash_logger.update_hash(doc_hash, HashStatus.SENT)
+            self._log_hash(doc_hash, HashStatus.SENT)
 
             # The below function typically calls the LLM
             result = provider.prepare_sync_call(
                 params,
                 **kwargs,
             )
-            self.dash_logger.update_hash(doc_hash, HashStatus.RECEIVED)
+            self._log_hash(doc_hash, HashStatus.RECEIVED)
 
             parsed = provider.parse_response(result)
 
-            self._ds.store(call_id, parsed, upsert=self._rewrite_cache)
+            if parsed.metadata:
+                # Fail this call now, rather than a later flush, if its metadata cannot be stored
+                fastjson.dumps(parsed.metadata)
+
+            self._write_buffer.append((call_id, parsed))
+            if (
+                durable
+                or len(self._write_buffer) >= self._flush_size
+                or time.monotonic() - self._last_flush >= self._flush_interval_s
+            ):
+                self._flush_writes(final=durable)
 
             # Store in pending results for immediate retrieval
-            key = f"{doc_hash}:{seq_id}"
-            self._pending_results[key] = parsed.text
+            self._remember_result(key, parsed)
 
             return ReadyLLMResponse(call_id=call_id, pr=parsed)
 
-        except Exception as e:
-            # Store the exception for later retrieval
-            key = f"{doc_hash}:{seq_id}"
-            self._pending_results[key] = e
+        except Exception:
+            # Forget any earlier result, so that retrieve falls through
+            # to the datastore and a retry reaches the provider again
+            self._pending_results.pop(key, None)
             raise
 
+    def _flush_writes(self, *, final: bool = False) -> None:
+        """
+        Write all buffered responses to the datastore.
+
+        If writing them together fails, each is retried on its own. Any that still fail
+        stay buffered for the next flush, so that they neither block later writes nor get lost.
+
+        :param final: Raise, rather than only warn, if some responses could not be written
+        """
+        self._last_flush = time.monotonic()
+        buffered = self._write_buffer
+        if not buffered:
+            return
+
+        try:
+            self._ds.store_many(buffered, upsert=self._rewrite_cache)
+        except Exception:
+            failed = []
+            error = None
+            for item in buffered:
+                try:
+                    self._ds.store_many([item], upsert=self._rewrite_cache)
+                except Exception as e:
+                    failed.append(item)
+                    error = error or e
+                    logger.warning(
+                        f"Failed to store response for {item[0]['doc_hash']}: {e}"
+                    )
+            buffered[:] = failed
+            if failed and final:
+                raise RuntimeError(
+                    f"{len(failed)} buffered responses could not be stored"
+                ) from error
+        else:
+            buffered.clear()
+
+    def _remember_result(self, key: tuple, result: ParsedResponse) -> None:
+        """Keep a result for retrieval, evicting the oldest beyond the limit"""
+        self._pending_results[key] = result
+        self._pending_results.move_to_end(key)
+        if len(self._pending_results) > self._max_pending_results:
+            self._pending_results.popitem(last=False)
+
     def _poll_changes(self, call_id: CallIdentifier):
         """
         Synchronous version - no polling needed since operations complete immediately
@@ -140,34 +285,40 @@ class SyncBackend(BaseBackend):
         The required fields from call_id are:
         - agent_name, doc_hash, seq_id
         """
-        # Check if we have a pending result
-        # Within one session, doc_hash should not be necessary
-        key = f"{call_id['agent_name']}:{call_id['seq_id']}"
-        if key in self._pending_results:
-            result = self._pending_results[key]
-            if isinstance(result, Exception):
-                raise result
-            # If we have a pending result (which is just text), wrap it in ParsedResponse
-            return ParsedResponse(text=result, response_id=None, metadata=None)
+        # Check if we have a pending result.
+        # Metadata is only kept in the datastore.
+        if not metadata:
+            key = (call_id["agent_name"], call_id["doc_hash"], call_id["seq_id"])
+            result = self._pending_results.get(key)
+            if result is not None:
+                return result
 
         # Fall back to datastore
+        self._flush_writes()
         return self._ds.retrieve(call_id, metadata=metadata)
 
     def persist(self):
         """Persist any remaining data and datastore"""
-        # SQLite commits immediately, but we can clear pending results
-        self._ds.persist()
+        try:
+            self._flush_writes(final=True)
+        finally:
+            self._ds.persist()
 
     def close(self):
-        """Clean up resources"""
-        if hasattr(self._ds, "close"):
+        """Clean up resources. Only the first call has any effect."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._flush_writes(final=True)
+        finally:
+            # Release resources even if the final write fails
+            self._finalizer.detach()
             self._ds.close()
-        self._pending_results.clear()
+            self._pending_results.clear()
 
-    def __del__(self):
-        """Clean up resources when the SyncBackend is destroyed"""
-        try:
-            self.close()
-        except Exception:
-            # Ignore errors during cleanup in destructor
-            pass
+            # Let the logging thread finish any queued updates
+            if self._log_thread is not None:
+                self._log_q.put(None)
+                self._log_thread.join()
+                self._log_thread = None
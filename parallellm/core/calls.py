@@ -1,3 +1,4 @@
+from operator import itemgetter
 from parallellm.types import CallIdentifier
 
 
@@ -10,11 +11,18 @@ def _call_to_concise_dict(call: CallIdentifier) -> dict:
     }
 
 
+_CALL_DEFAULTS = {"session_id": None, "provider_type": None}
+
+
 def _concise_dict_to_call(d: dict) -> CallIdentifier:
-    """Convert concise dict back to CallIdentifier. Mutates in place."""
-    d.setdefault("session_id", None)
-    d.setdefault("provider_type", None)
-    return d
+    """Convert concise dict back to CallIdentifier. Returns a new dict."""
+    return {**_CALL_DEFAULTS, **d}
+
+
+_CALL_KEYS = ("agent_name", "doc_hash", "seq_id")
+
+_call_key = itemgetter(*_CALL_KEYS)
+"""The (agent_name, doc_hash, seq_id) tuple that identifies a call across sessions."""
 
 
 def _call_matches(c1: CallIdentifier, c2: CallIdentifier) -> bool:
@@ -25,5 +33,4 @@ def _call_matches(c1: CallIdentifier, c2: CallIdentifier) -> bool:
     but calls are conceptually the same across different sessions if they have
     the same doc_hash and seq_id.
     """
-    keys = ["agent_name", "doc_hash", "seq_id"]
-    return all(c1[key] == c2[key] for key in keys)
+    return _call_key(c1) == _call_key(c2)
@@ -1,7 +1,7 @@
-import json
 from typing import List, Tuple
 
 from parallellm.types import ToolCall
+from parallellm.utils.fastjson import dumps, loads
 
 
 def dump_tool_calls(tool_calls: List[ToolCall]) -> str:
@@ -10,14 +10,14 @@ def dump_tool_calls(tool_calls: List[ToolCall]) -> str:
     """
     if tool_calls is None:
         return None
-    return json.dumps([[call.name, call.args, call.call_id] for call in tool_calls])
+    return dumps([(call.name, call.args, call.call_id) for call in tool_calls])
 
 
 def load_tool_calls(data: str) -> List[ToolCall]:
     """
     Deserialize a list of tuples into a list of ToolCall objects.
     """
-    tuples = json.loads(data)
+    tuples = loads(data)
     return [
         ToolCall(name=name, arguments=arguments, call_id=call_id)
         for name, arguments, call_id in tuples
@@ -49,8 +49,29 @@ class Datastore(ABC):
         """
         raise NotImplementedError
 
+    def store_many(
+        self,
+        items: list[tuple[CallIdentifier, ParsedResponse]],
+        *,
+        upsert: bool = False,
+    ):
+        """
+        Store several responses in the backend.
+
+        :param items: (call_id, parsed_response) pairs to store, in order.
+        :param upsert: If True, update existing records instead of inserting duplicates.
+        """
+        for call_id, parsed_response in items:
+            self.store(call_id, parsed_response, upsert=upsert)
+
     def persist(self) -> None:
         """
         Persist changes to file(s). Cleans up resources.
         """
         raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Release any open resources, such as connections. Safe to call more than once.
+        """
+        pass
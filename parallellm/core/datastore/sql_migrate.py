@@ -132,7 +132,8 @@ def _remove_unique_constraints(conn: sqlite3.Connection) -> None:
         # Rollback on error
         try:
             conn.execute("ROLLBACK")
-        except:
+        except sqlite3.Error:
+            # No transaction was open
             pass
         raise RuntimeError(f"Failed to remove UNIQUE constraints: {e}")
 
@@ -206,7 +207,8 @@ def _remove_provider_type_from_anon_responses(conn: sqlite3.Connection) -> None:
         # Rollback on error
         try:
             conn.execute("ROLLBACK")
-        except:
+        except sqlite3.Error:
+            # No transaction was open
             pass
         raise RuntimeError(f"Failed to remove provider_type column: {e}")
 
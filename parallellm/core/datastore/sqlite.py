@@ -2,6 +2,7 @@ import sqlite3
 import json
 import threading
 import polars as pl
+from functools import lru_cache
 from typing import Optional
 
 from parallellm.core.cast.fix_tools import dump_tool_calls, load_tool_calls
@@ -13,6 +14,7 @@ from parallellm.core.datastore.sql_migrate import (
 from parallellm.core.sink.sequester import sequester_metadata
 from parallellm.core.sink.to_parquet import ParquetWriter
 from parallellm.file_io.file_manager import FileManager
+from parallellm.utils import fastjson
 from parallellm.types import (
     BatchIdentifier,
     BatchResult,
@@ -20,27 +22,74 @@ from parallellm.types import (
     ParsedResponse,
 )
 
+_INSERT_METADATA_SQL = "INSERT OR REPLACE INTO metadata (response_id, agent_name, seq_id, session_id, metadata, provider_type) VALUES (?, ?, ?, ?, ?, ?)"
+_DELETE_SEQUESTERED_SQL = "DELETE FROM metadata WHERE response_id = ? AND (provider_type IN ('openai', 'google') OR provider_type IS NULL)"
+_SELECT_SEQUESTERABLE_SQL = """
+    SELECT m.id, m.response_id, m.agent_name, m.seq_id, m.session_id, m.metadata, m.provider_type
+    FROM metadata m
+    WHERE (m.provider_type IN ('openai', 'google') OR m.provider_type IS NULL) AND m.id > ?
+    ORDER BY m.id
+    LIMIT ?
+"""
+# Metadata rows moved to Parquet per round trip, bounding memory during a transfer
+_TRANSFER_BATCH_SIZE = 10_000
+
+
+@lru_cache(maxsize=None)
+def _insert_sql(table_name: str, columns: tuple[str, ...]) -> str:
+    """
+    Build (once) the INSERT statement for a table and column set.
+
+    Reusing the identical string lets sqlite3 reuse its prepared statement.
+    """
+    placeholders = ", ".join("?" for _ in columns)
+    return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+@lru_cache(maxsize=None)
+def _update_sql(table_name: str, columns: tuple[str, ...]) -> str:
+    """Build (once) the UPDATE-by-id statement for a table and column set."""
+    set_clauses = ", ".join(f"{col} = ?" for col in columns)
+    return f"UPDATE {table_name} SET {set_clauses} WHERE id = ?"
+
+
+# Applied in order to every new connection.
+_PERFORMANCE_PRAGMAS = (
+    # Only takes effect before the database is first written to
+    "PRAGMA page_size=4096",
+    # WAL journal: readers don't block the writer, and commits need fewer fsyncs
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
 
 class SQLiteDatastore(Datastore):
     """
     SQLite-backed Datastore implementation
     """
 
-    def __init__(self, file_manager: FileManager):
+    def __init__(self, file_manager: FileManager, *, tune_pragmas: bool = True):
         """
         Initialize SQLite Datastore.
 
         :param file_manager: FileManager instance to handle file I/O operations
+        :param tune_pragmas: Whether to apply the performance PRAGMAs to new connections
         """
         self.file_manager = file_manager
+        self._tune_pragmas = tune_pragmas
         # Use threading.local to ensure each thread has its own connections
         self._local = threading.local()
-        self._is_dirty = False
+        # Whether metadata may be waiting in SQLite to be moved to Parquet.
+        # Starts True so that rows left over from earlier sessions are moved too.
+        self._is_dirty = True
 
+        # Sequestered metadata lives here; resolved once rather than per lookup
+        self._apimeta_dir = self.file_manager.allocate_datastore() / "apimeta"
         self._metadata_index = ParquetWriter(
-            self.file_manager.allocate_datastore()
-            / "apimeta"
-            / "metadata-index.parquet",
+            self._apimeta_dir / "metadata-index.parquet",
             schema={
                 "response_id": pl.Utf8,
                 "agent_name": pl.Utf8,
@@ -89,9 +138,13 @@ class SQLiteDatastore(Datastore):
                 db_path = datastore_dir / f"{db_name}-datastore.db"
 
             # Create connection
-            conn = sqlite3.connect(str(db_path))
+            conn = sqlite3.connect(str(db_path), cached_statements=512)
             conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
 
+            if self._tune_pragmas:
+                for pragma in _PERFORMANCE_PRAGMAS:
+                    conn.execute(pragma)
+
             # For main database (db_name is None), create response table
             if db_name is None:
                 # Responses table: agent_name can be NULL
@@ -194,7 +247,6 @@ class SQLiteDatastore(Datastore):
             conn.commit()
             connections[connection_key] = conn
 
-        self._is_dirty = True
         return connections[connection_key]
 
     def retrieve(
@@ -219,22 +271,13 @@ class SQLiteDatastore(Datastore):
 
         where_conditions, params = self._build_where_clause(agent_name, doc_hash)
 
-        # Try with seq_id first (most specific), get oldest entry
-        full_where = where_conditions + " AND seq_id = ?"
-        full_params = params + [seq_id]
-
+        # Prefer a matching seq_id (most specific), falling back to any seq_id;
+        # either way, get the oldest entry. One query serves both cases, so a miss costs one lookup.
         cursor = conn.execute(
-            f"SELECT response, response_id, tool_calls FROM {table_name} WHERE {full_where} ORDER BY id ASC LIMIT 1",
-            full_params,
+            f"SELECT response, response_id, tool_calls FROM {table_name} WHERE {where_conditions} ORDER BY seq_id = ? DESC, id ASC LIMIT 1",
+            params + [seq_id],
         )
         row = cursor.fetchone()
-        if not row:
-            # Fallback: try without seq_id (less specific), get oldest entry
-            cursor = conn.execute(
-                f"SELECT response, response_id, tool_calls FROM {table_name} WHERE {where_conditions} ORDER BY id ASC LIMIT 1",
-                params,
-            )
-            row = cursor.fetchone()
 
         if row is None:
             return None
@@ -285,7 +328,7 @@ class SQLiteDatastore(Datastore):
         )
         metadata_row = cursor.fetchone()
         if metadata_row and metadata_row["metadata"]:
-            return json.loads(metadata_row["metadata"])
+            return fastjson.loads(metadata_row["metadata"])
 
         # If not found in SQLite, check the parquet manager's metadata cache
         # return self._metadata_parquet.get({"response_id": response_id})
@@ -298,11 +341,9 @@ class SQLiteDatastore(Datastore):
         else:
             provider_type = "google"
         relevant = ParquetWriter(
-            self.file_manager.allocate_datastore()
-            / "apimeta"
-            / f"{provider_type}-responses.parquet"
+            self._apimeta_dir / f"{provider_type}-responses.parquet"
         )
-        return relevant.get({"response_id": response_id}).row(0, named=True)
+        return relevant.get({"response_id": response_id}, limit=1).row(0, named=True)
 
     def retrieve_metadata(
         self, agent_name: str, seq_id: int, session_id: int
@@ -325,22 +366,22 @@ class SQLiteDatastore(Datastore):
         )
         metadata_row = cursor.fetchone()
         if metadata_row and metadata_row["metadata"]:
-            return json.loads(metadata_row["metadata"])
+            return fastjson.loads(metadata_row["metadata"])
 
         # If not found in SQLite, check parquet
         matches = self._metadata_index.get(
-            {"agent_name": agent_name, "seq_id": seq_id, "session_id": session_id}
+            {"agent_name": agent_name, "seq_id": seq_id, "session_id": session_id},
+            limit=1,
+            columns=["provider_type", "response_id"],
         )
         if matches.height:
             provider_type = matches.item(0, "provider_type")
             resp_id = matches.item(0, "response_id")
 
             relevant = ParquetWriter(
-                self.file_manager.allocate_datastore()
-                / "apimeta"
-                / f"{provider_type}-responses.parquet"
+                self._apimeta_dir / f"{provider_type}-responses.parquet"
             )
-            return relevant.get({"response_id": resp_id}).row(0, named=True)
+            return relevant.get({"response_id": resp_id}, limit=1).row(0, named=True)
 
     def _build_where_clause(
         self,
@@ -387,7 +428,7 @@ class SQLiteDatastore(Datastore):
         :param where_params: Parameters for the WHERE clause (required if upsert=True)
         :param upsert: If True, update oldest (min ID) existing record instead of inserting duplicate
         """
-        columns = list(record.keys())
+        columns = tuple(record.keys())
         values = list(record.values())
 
         if upsert:
@@ -403,19 +444,13 @@ class SQLiteDatastore(Datastore):
 
             if existing:
                 # Update the oldest existing record (minimum ID)
-                set_clauses = [f"{col} = ?" for col in columns]
-                update_sql = (
-                    f"UPDATE {table_name} SET {', '.join(set_clauses)} WHERE id = ?"
+                conn.execute(
+                    _update_sql(table_name, columns), values + [existing["id"]]
                 )
-                conn.execute(update_sql, values + [existing["id"]])
                 return
 
         # Insert new record (either upsert with no existing, or normal insert)
-        placeholders = ", ".join(["?" for _ in columns])
-        insert_sql = (
-            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
-        )
-        conn.execute(insert_sql, values)
+        conn.execute(_insert_sql(table_name, columns), values)
 
     def store(
         self,
@@ -431,6 +466,56 @@ class SQLiteDatastore(Datastore):
         :param parsed_response: The parsed response object containing text, response_id, and metadata.
         :param upsert: If True, update existing record instead of inserting duplicate (default: False)
         """
+        self.store_many([(call_id, parsed_response)], upsert=upsert)
+
+    def store_many(
+        self,
+        items: list[tuple[CallIdentifier, "ParsedResponse"]],
+        *,
+        upsert: bool = False,
+    ):
+        """
+        Store several responses in SQLite, in a single transaction.
+
+        :param items: (call_id, parsed_response) pairs to store, in order.
+        :param upsert: If True, update existing records instead of inserting duplicates (default: False)
+        """
+        if not items:
+            return
+
+        # Get main database connection
+        conn = self._get_connection(None)
+
+        try:
+            for call_id, parsed_response in items:
+                self._store(conn, call_id, parsed_response, upsert=upsert)
+
+            conn.commit()
+
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise RuntimeError(f"SQLite error while storing response: {e}")
+        except Exception:
+            # e.g. unserializable metadata; don't leave earlier rows in an open transaction
+            conn.rollback()
+            raise
+
+    def _store(
+        self,
+        conn: sqlite3.Connection,
+        call_id: CallIdentifier,
+        parsed_response: "ParsedResponse",
+        *,
+        upsert: bool,
+    ):
+        """
+        Insert a response and its metadata, without committing.
+
+        :param conn: The connection to write with
+        :param call_id: The task identifier containing doc_hash, seq_id, and session_id.
+        :param parsed_response: The parsed response object containing text, response_id, and metadata.
+        :param upsert: If True, update existing record instead of inserting duplicate
+        """
         doc_hash = call_id["doc_hash"]
         seq_id = call_id["seq_id"]
         session_id = call_id["session_id"]
@@ -443,64 +528,50 @@ class SQLiteDatastore(Datastore):
         metadata = parsed_response.metadata
         tool_calls = parsed_response.tool_calls
 
-        # Get main database connection
-        conn = self._get_connection(None)
-
-        # Determine table and build WHERE clause
         table_name = "anon_responses"
-        where_clause, where_params = self._build_where_clause(agent_name, doc_hash)
 
-        try:
-            # Prepare record for INSERT/UPDATE
-            tool_calls_json = dump_tool_calls(tool_calls)
+        # Prepare record for INSERT/UPDATE
+        tool_calls_json = dump_tool_calls(tool_calls)
 
-            record = {
-                "agent_name": agent_name,
-                "seq_id": seq_id,
-                "session_id": session_id,
-                "doc_hash": doc_hash,
-                "response": response,
-                # "response_id": response_id,
-                "tool_calls": tool_calls_json,
-            }
-
-            # Insert the response (or update if upsert=True)
-            if upsert:
-                where_clause, where_params = self._build_where_clause(
-                    agent_name, doc_hash
-                )
-            else:
-                where_clause = where_params = None
-            self._insert_response(
-                conn,
-                table_name,
-                record,
-                where_clause=where_clause,
-                where_params=where_params,
-                upsert=upsert,
-            )
+        record = {
+            "agent_name": agent_name,
+            "seq_id": seq_id,
+            "session_id": session_id,
+            "doc_hash": doc_hash,
+            "response": response,
+            # "response_id": response_id,
+            "tool_calls": tool_calls_json,
+        }
 
-            # Store metadata if provided
-            if metadata:
-                metadata_json = json.dumps(metadata)
-                conn.execute(
-                    "INSERT OR REPLACE INTO metadata (response_id, agent_name, seq_id, session_id, metadata, provider_type) VALUES (?, ?, ?, ?, ?, ?)",
-                    (
-                        response_id,
-                        agent_name,
-                        seq_id,
-                        session_id,
-                        metadata_json,
-                        provider_type,
-                    ),
-                )
-
-            # Always commit immediately for thread safety
-            conn.commit()
+        # Insert the response (or update if upsert=True)
+        if upsert:
+            where_clause, where_params = self._build_where_clause(agent_name, doc_hash)
+        else:
+            where_clause = where_params = None
+        self._insert_response(
+            conn,
+            table_name,
+            record,
+            where_clause=where_clause,
+            where_params=where_params,
+            upsert=upsert,
+        )
 
-        except sqlite3.Error as e:
-            conn.rollback()
-            raise RuntimeError(f"SQLite error while storing response: {e}")
+        # Store metadata if provided
+        if metadata:
+            metadata_json = fastjson.dumps(metadata)
+            self._is_dirty = True
+            conn.execute(
+                _INSERT_METADATA_SQL,
+                (
+                    response_id,
+                    agent_name,
+                    seq_id,
+                    session_id,
+                    metadata_json,
+                    provider_type,
+                ),
+            )
 
     def store_pending_batch(
         self,
@@ -514,37 +585,45 @@ class SQLiteDatastore(Datastore):
 
         :param batch_id: The batch identifier containing call_ids, custom_ids, and batch_uuid
         """
+        self.store_pending_batch_many([batch_id])
+
+    def store_pending_batch_many(
+        self,
+        batch_ids: list[BatchIdentifier],
+    ) -> None:
+        """
+        Store several pending batches in a single transaction.
+
+        :param batch_ids: The batch identifiers, each containing call_ids, custom_ids, and batch_uuid
+        """
         conn = self._get_connection(None)
 
+        rows = [
+            (
+                call_id["agent_name"],
+                call_id["seq_id"],
+                call_id["session_id"],
+                call_id["doc_hash"],
+                call_id.get("provider_type"),
+                batch_id.batch_uuid,
+                custom_id,
+            )
+            for batch_id in batch_ids
+            for call_id, custom_id in zip(batch_id.call_ids, batch_id.custom_ids)
+        ]
+
         try:
-            # Insert each call_id from the batch into the batch_pending table
-            for call_id, custom_id in zip(batch_id.call_ids, batch_id.custom_ids):
-                agent_name = call_id["agent_name"]
-                seq_id = call_id["seq_id"]
-                session_id = call_id["session_id"]
-                doc_hash = call_id["doc_hash"]
-                provider_type = call_id.get("provider_type")
-                batch_uuid = batch_id.batch_uuid
-
-                # Insert or replace the pending batch record
-                conn.execute(
-                    """
-                    INSERT OR REPLACE INTO batch_pending 
-                    (agent_name, seq_id, session_id, doc_hash, provider_type, batch_uuid, custom_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        agent_name,
-                        seq_id,
-                        session_id,
-                        doc_hash,
-                        provider_type,
-                        batch_uuid,
-                        custom_id,
-                    ),
-                )
+            # Insert or replace the pending batch records
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO batch_pending 
+                (agent_name, seq_id, session_id, doc_hash, provider_type, batch_uuid, custom_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
 
-            # Commit immediately for thread safety
+            # Commit once for all batches
             conn.commit()
 
         except sqlite3.Error as e:
@@ -572,91 +651,159 @@ class SQLiteDatastore(Datastore):
         conn = self._get_connection(None)
 
         try:
-            # Process each response in the batch
-            for i, parsed in enumerate(batch_result.parsed_responses):
-                custom_id = parsed.response_id
-                # Look up the call_id using custom_id from active batch_pending
-                cursor = conn.execute(
-                    """
-                    SELECT agent_name, seq_id, session_id, doc_hash, provider_type
-                    FROM batch_pending
-                    WHERE custom_id = ? AND is_pending = 1
-                    LIMIT 1
-                    """,
-                    (custom_id,),
+            self._store_ready_batch(conn, batch_result, upsert=upsert)
+
+            # Commit all changes
+            conn.commit()
+
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise RuntimeError(f"SQLite error while storing batch results: {e}")
+
+    def _store_ready_batch(
+        self,
+        conn: sqlite3.Connection,
+        batch_result: BatchResult,
+        *,
+        upsert: bool = False,
+    ) -> None:
+        """
+        Store completed batch results without committing.
+
+        :param conn: SQLite connection
+        :param batch_result: The completed batch results to store
+        :param upsert: If True, update existing records instead of inserting duplicates
+        """
+        # Process each response in the batch
+        for i, parsed in enumerate(batch_result.parsed_responses):
+            custom_id = parsed.response_id
+            # Look up the call_id using custom_id from active batch_pending
+            cursor = conn.execute(
+                """
+                SELECT agent_name, seq_id, session_id, doc_hash, provider_type
+                FROM batch_pending
+                WHERE custom_id = ? AND is_pending = 1
+                LIMIT 1
+                """,
+                (custom_id,),
+            )
+            row = cursor.fetchone()
+
+            if not row:
+                raise ValueError(
+                    f"Could not find pending batch record for custom_id: {custom_id}"
                 )
-                row = cursor.fetchone()
 
-                if not row:
-                    raise ValueError(
-                        f"Could not find pending batch record for custom_id: {custom_id}"
-                    )
+            agent_name = row["agent_name"]
+            seq_id = row["seq_id"]
+            session_id = row["session_id"]
+            doc_hash = row["doc_hash"]
+            provider_type = row["provider_type"]
 
-                agent_name = row["agent_name"]
-                seq_id = row["seq_id"]
-                session_id = row["session_id"]
-                doc_hash = row["doc_hash"]
-                provider_type = row["provider_type"]
-
-                # Use anon_responses table
-                table_name = "anon_responses"
-
-                # Get response components from parsed_response
-                resp_text = parsed.text
-                response_id = parsed.response_id
-                metadata = parsed.metadata
-                tool_calls = parsed.tool_calls
-
-                # Serialize tool_calls to JSON if present
-                tool_calls_json = dump_tool_calls(tool_calls)
-
-                # Prepare record for INSERT/UPDATE
-                record = {
-                    "agent_name": agent_name,
-                    "seq_id": seq_id,
-                    "session_id": session_id,
-                    "doc_hash": doc_hash,
-                    "response": resp_text,
-                    "response_id": custom_id,  # Use custom_id as response_id for batch results
-                    "tool_calls": tool_calls_json,
-                }
-                # Insert the response (or update if upsert=True)
-                if upsert:
-                    where_clause, where_params = self._build_where_clause(
-                        agent_name, doc_hash
-                    )
-                else:
-                    where_clause = where_params = None
-                self._insert_response(
-                    conn,
-                    table_name,
-                    record,
-                    where_clause=where_clause,
-                    where_params=where_params,
-                    upsert=upsert,
+            # Use anon_responses table
+            table_name = "anon_responses"
+
+            # Get response components from parsed_response
+            resp_text = parsed.text
+            response_id = parsed.response_id
+            metadata = parsed.metadata
+            tool_calls = parsed.tool_calls
+
+            # Serialize tool_calls to JSON if present
+            tool_calls_json = dump_tool_calls(tool_calls)
+
+            # Prepare record for INSERT/UPDATE
+            record = {
+                "agent_name": agent_name,
+                "seq_id": seq_id,
+                "session_id": session_id,
+                "doc_hash": doc_hash,
+                "response": resp_text,
+                "response_id": custom_id,  # Use custom_id as response_id for batch results
+                "tool_calls": tool_calls_json,
+            }
+            # Insert the response (or update if upsert=True)
+            if upsert:
+                where_clause, where_params = self._build_where_clause(
+                    agent_name, doc_hash
                 )
+            else:
+                where_clause = where_params = None
+            self._insert_response(
+                conn,
+                table_name,
+                record,
+                where_clause=where_clause,
+                where_params=where_params,
+                upsert=upsert,
+            )
 
-                # Store metadata if available
-                if metadata:
-                    metadata_json = json.dumps(metadata)
+            # Store metadata if available
+            if metadata:
+                metadata_json = fastjson.dumps(metadata)
+                self._is_dirty = True
+                conn.execute(
+                    _INSERT_METADATA_SQL,
+                    (
+                        custom_id,
+                        agent_name,
+                        seq_id,
+                        session_id,
+                        metadata_json,
+                        provider_type,
+                    ),
+                )
+
+    def finalize_batches(
+        self,
+        results_by_uuid: dict[str, list[BatchResult]],
+        *,
+        upsert: bool = False,
+    ) -> dict[str, ValueError]:
+        """
+        Store the ready results of finished batches and deactivate their pending records,
+        all in a single transaction.
+
+        A batch whose results cannot be matched to its pending records is rolled back
+        on its own and left pending; the other batches are still stored.
+
+        :param results_by_uuid: Maps each finished batch_uuid to its downloaded results
+        :param upsert: If True, update existing records instead of inserting duplicates (default: False)
+        :returns: The batches that could not be stored, mapped to their errors
+        """
+        failed: dict[str, ValueError] = {}
+        if not results_by_uuid:
+            return failed
+
+        conn = self._get_connection(None)
+
+        try:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for batch_uuid, batch_results in results_by_uuid.items():
+                conn.execute("SAVEPOINT finalize_batch")
+                try:
+                    for batch_result in batch_results:
+                        if (
+                            batch_result.status == "ready"
+                            and batch_result.parsed_responses
+                        ):
+                            self._store_ready_batch(conn, batch_result, upsert=upsert)
                     conn.execute(
-                        "INSERT OR REPLACE INTO metadata (response_id, agent_name, seq_id, session_id, metadata, provider_type) VALUES (?, ?, ?, ?, ?, ?)",
-                        (
-                            custom_id,
-                            agent_name,
-                            seq_id,
-                            session_id,
-                            metadata_json,
-                            provider_type,
-                        ),
+                        "UPDATE batch_pending SET is_pending = 0 WHERE batch_uuid = ?",
+                        (batch_uuid,),
                     )
-
-            # Commit all changes
+                except ValueError as e:
+                    conn.execute("ROLLBACK TO finalize_batch")
+                    failed[batch_uuid] = e
+                conn.execute("RELEASE finalize_batch")
             conn.commit()
 
         except sqlite3.Error as e:
             conn.rollback()
-            raise RuntimeError(f"SQLite error while storing batch results: {e}")
+            raise RuntimeError(f"SQLite error while finalizing batches: {e}")
+
+        return failed
 
     def retrieve_batch_call_ids(self, batch_uuid: str) -> list[CallIdentifier]:
         """
@@ -712,6 +859,19 @@ class SQLiteDatastore(Datastore):
 
         return batch_uuids
 
+    def get_all_pending_call_keys(self) -> set[tuple[Optional[str], str]]:
+        """
+        Retrieve the keys of all calls in active pending batches.
+
+        :returns: Set of (agent_name, doc_hash) pairs
+        """
+        conn = self._get_connection(None)
+
+        cursor = conn.execute(
+            "SELECT agent_name, doc_hash FROM batch_pending WHERE is_pending = 1"
+        )
+        return {(row["agent_name"], row["doc_hash"]) for row in cursor.fetchall()}
+
     def clear_batch_pending(self, batch_uuid: str) -> None:
         """
         Deactivate all pending batch records for a completed batch.
@@ -753,33 +913,75 @@ class SQLiteDatastore(Datastore):
         row = cursor.fetchone()
         return row["count"] > 0 if row else False
 
+    def is_call_in_pending_batch_many(
+        self, call_ids: list[CallIdentifier]
+    ) -> list[bool]:
+        """
+        Check several call_ids against active pending batches at once.
+
+        :param call_ids: The call identifiers to check
+        :returns: For each call_id (in order), whether it is in an active pending batch
+        """
+        if not call_ids:
+            return []
+
+        conn = self._get_connection(None)
+
+        doc_hashes = list({call_id["doc_hash"] for call_id in call_ids})
+        pending = set()
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(doc_hashes), 500):
+            chunk = doc_hashes[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(
+                f"SELECT agent_name, doc_hash FROM batch_pending WHERE doc_hash IN ({placeholders}) AND is_pending = 1",
+                chunk,
+            )
+            pending.update(
+                (row["agent_name"], row["doc_hash"]) for row in cursor.fetchall()
+            )
+
+        return [
+            (call_id["agent_name"], call_id["doc_hash"]) in pending
+            for call_id in call_ids
+        ]
+
     def _transfer_metadata_to_parquet(self) -> None:
         """Transfer supported metadata from SQLite to Parquet files."""
         conn = self._get_connection(None)
 
         try:
-            cursor = conn.execute("""
-                SELECT m.response_id, m.agent_name, m.seq_id, m.session_id, m.metadata, m.provider_type
-                FROM metadata m 
-                WHERE m.provider_type IN ('openai', 'google') OR m.provider_type IS NULL
-            """)
-            metadata_rows = cursor.fetchall()
-
-            if not metadata_rows:
-                return
-
-            mdir = self.file_manager.allocate_datastore() / "apimeta"
-            sequestered = sequester_metadata(metadata_rows, mdir, self._metadata_index)
-            if sequestered:
-                placeholders = ",".join(["?" for _ in sequestered])
-                conn.execute(
-                    f"DELETE FROM metadata WHERE response_id IN ({placeholders}) AND (provider_type IN ('openai', 'google') OR provider_type IS NULL)",
-                    sequestered,
+            # Page through by id, so only one batch of rows is held at a time.
+            # Each batch is deleted once written, so a failure part way through
+            # does not leave already-transferred rows behind to be written twice.
+            last_id = 0
+            while True:
+                metadata_rows = conn.execute(
+                    _SELECT_SEQUESTERABLE_SQL, (last_id, _TRANSFER_BATCH_SIZE)
+                ).fetchall()
+
+                if not metadata_rows:
+                    return
+                last_id = metadata_rows[-1]["id"]
+
+                sequestered = sequester_metadata(
+                    metadata_rows, self._apimeta_dir, self._metadata_index
                 )
-                conn.commit()
+                if sequestered:
+                    # One prepared statement and one transaction, however many rows;
+                    # a single IN (...) list would run into SQLite's variable limit
+                    conn.executemany(
+                        _DELETE_SEQUESTERED_SQL,
+                        ((response_id,) for response_id in sequestered),
+                    )
+                    conn.commit()
+
+                    # conn.execute("VACUUM")
 
-                # conn.execute("VACUUM")
+                if len(metadata_rows) < _TRANSFER_BATCH_SIZE:
+                    return
         except sqlite3.Error as e:
+            conn.rollback()
             raise RuntimeError(f"SQLite error during metadata transfer: {e}")
 
     def persist(self) -> None:
@@ -792,10 +994,15 @@ class SQLiteDatastore(Datastore):
         Also, OpenAI metadata is transferred from SQLite to Parquet files
         for better storage efficiency.
         """
-        # Transfer all metadata to parquet
-        if hasattr(self, "_local") and hasattr(self._local, "connections"):
+        # Transfer all metadata to parquet, unless none was stored since the last transfer
+        if (
+            self._is_dirty
+            and hasattr(self, "_local")
+            and hasattr(self._local, "connections")
+        ):
             try:
                 self._transfer_metadata_to_parquet()
+                self._is_dirty = False
                 # Refresh parquet manager cache after sequestering
                 # self._metadata_parquet.commit()
             except Exception as e:
@@ -804,6 +1011,19 @@ class SQLiteDatastore(Datastore):
 
         # Note: SQLite implementation always commits immediately
 
+        if (
+            self._tune_pragmas
+            and hasattr(self, "_local")
+            and hasattr(self._local, "connections")
+        ):
+            # Refresh query planner statistics, as SQLite recommends before closing
+            for conn in self._get_connections().values():
+                try:
+                    conn.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    # Statistics only affect query plans, never results
+                    pass
+
         # Close all connections to ensure proper cleanup, especially important on Windows
         self.close()
 
@@ -99,6 +99,7 @@ class ParalleLLMGateway:
                 session_id=fm._get_session_counter(),
                 confirm_batch_submission=tweaks.batch_user_confirmation,
                 rewrite_cache=rewrite_cache,
+                submission_tps=tweaks.batch_submission_tps,
             )
         else:
             raise NotImplementedError(f"Strategy '{strategy}' is not implemented yet")
@@ -1,5 +1,5 @@
 import hashlib
-from typing import List, Optional
+from typing import Callable, Iterable, Optional
 from io import BytesIO
 from PIL import Image
 
@@ -11,7 +11,71 @@ def _updateh(hasher, val: Optional[str]):
         hasher.update(val.encode("utf-8"))
 
 
-def compute_hash(instructions: Optional[str], documents: List[LLMDocument]) -> str:
+def _hash_str(hasher, doc: str):
+    hasher.update(doc.encode("utf-8"))
+
+
+def _hash_image(hasher, doc: Image.Image):
+    with BytesIO() as img_buffer:
+        doc.save(img_buffer, format="PNG")
+        hasher.update(img_buffer.getvalue())
+
+
+def _hash_tool_call_request(hasher, doc: ToolCallRequest):
+    hasher.update(b"function_call")
+    _updateh(hasher, doc.text_content)
+    for call in doc.calls:
+        # hasher.update(str(call).encode("utf-8"))
+        _updateh(hasher, call.name)
+        _updateh(hasher, call.arg_str)
+        _updateh(hasher, call.call_id)
+
+
+def _hash_tool_call_output(hasher, doc: ToolCallOutput):
+    hasher.update(b"function_call_output")
+    _updateh(hasher, doc.name)
+    _updateh(hasher, doc.content)
+    _updateh(hasher, doc.call_id)
+
+
+def _hash_tuple(hasher, doc: tuple):
+    # Handle Tuple[Literal["user", "assistant", "system", "developer"], str]
+    if len(doc) != 2:
+        raise ValueError(f"Unsupported document type: {type(doc)}")
+    role, content = doc
+    hasher.update(role.encode("utf-8"))
+    if isinstance(content, str):
+        hasher.update(content.encode("utf-8"))
+    else:
+        for item in content:
+            hasher.update(str(item).encode("utf-8"))
+
+
+# Checked in order; subclasses are resolved once and added to _HASH_DISPATCH
+_HASH_HANDLERS = (
+    (str, _hash_str),
+    (Image.Image, _hash_image),
+    (ToolCallRequest, _hash_tool_call_request),
+    (ToolCallOutput, _hash_tool_call_output),
+    (tuple, _hash_tuple),
+)
+_HASH_DISPATCH: dict[type, Callable] = dict(_HASH_HANDLERS)
+
+
+def _hash_handler(doc_type: type) -> Callable:
+    """Find the handler for a document type, caching subclasses"""
+    handler = _HASH_DISPATCH.get(doc_type)
+    if handler is None:
+        for base, base_handler in _HASH_HANDLERS:
+            if issubclass(doc_type, base):
+                handler = _HASH_DISPATCH[doc_type] = base_handler
+                break
+        else:
+            raise ValueError(f"Unsupported document type: {doc_type}")
+    return handler
+
+
+def compute_hash(instructions: Optional[str], documents: Iterable[LLMDocument]) -> str:
     """
     Compute a hash for the given instructions and documents.
 
@@ -22,36 +86,11 @@ def compute_hash(instructions: Optional[str], documents: List[LLMDocument]) -> s
     hasher = hashlib.sha256()
     if instructions:
         hasher.update(instructions.encode("utf-8"))
+    # Bound once: the loop runs per document
+    dispatch_get = _HASH_DISPATCH.get
     for doc in documents:
-        if isinstance(doc, str):
-            hasher.update(doc.encode("utf-8"))
-        elif isinstance(doc, Image.Image):
-            with BytesIO() as img_buffer:
-                doc.save(img_buffer, format="PNG")
-                hasher.update(img_buffer.getvalue())
-        elif isinstance(doc, ToolCallRequest):
-            hasher.update(b"function_call")
-            _updateh(hasher, doc.text_content)
-            for call in doc.calls:
-                # hasher.update(str(call).encode("utf-8"))
-                _updateh(hasher, call.name)
-                _updateh(hasher, call.arg_str)
-                _updateh(hasher, call.call_id)
-        elif isinstance(doc, ToolCallOutput):
-            hasher.update(b"function_call_output")
-            _updateh(hasher, doc.name)
-            _updateh(hasher, doc.content)
-            _updateh(hasher, doc.call_id)
-        elif isinstance(doc, tuple) and len(doc) == 2:
-            # Handle Tuple[Literal["user", "assistant", "system", "developer"], str]
-            role, content = doc
-            hasher.update(role.encode("utf-8"))
-            if isinstance(content, str):
-                hasher.update(content.encode("utf-8"))
-            else:
-                for item in content:
-                    hasher.update(str(item).encode("utf-8"))
-        else:
-            raise ValueError(f"Unsupported document type: {type(doc)}")
+        doc_type = type(doc)
+        handler = dispatch_get(doc_type) or _hash_handler(doc_type)
+        handler(hasher, doc)
 
     return hasher.hexdigest()
@@ -170,10 +170,7 @@ class MessageState(UserList[Union[LLMDocument, LLMResponse]], Askable):
         Cast the MessageState to a list of standardized LLMDocuments.
         """
         # Convert LLMResponse into corresponding messages
-        result = []
-        for i, doc in enumerate(self):
-            if isinstance(doc, LLMResponse):
-                result.append(doc.to_assistant_message())
-            else:
-                result.append(doc)
-        return result
+        return [
+            doc.to_assistant_message() if isinstance(doc, LLMResponse) else doc
+            for doc in self
+        ]
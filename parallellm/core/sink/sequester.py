@@ -6,6 +6,8 @@ from parallellm.core.sink.to_parquet import ParquetWriter, write_to_parquet
 from parallellm.provider.google._sink import google_metadata_sinker
 from parallellm.provider.openai._sink import openai_metadata_sinker
 
+_INDEX_COLUMNS = ("response_id", "agent_name", "seq_id", "session_id", "provider_type")
+
 
 def sequester_metadata(
     metadata_rows: list[Dict], folder: Path, master_index: ParquetWriter
@@ -22,25 +24,14 @@ def sequester_metadata(
         "google": [],
     }
 
-    for row in metadata_rows:
-        response_id = row["response_id"]
-        metadata_json = row["metadata"]
-        provider_type = row["provider_type"]
-
-        agent_name = row["agent_name"]
-        seq_id = row["seq_id"]
-        session_id = row["session_id"]
-
-        master_index.log(
-            {
-                "response_id": response_id,
-                "agent_name": agent_name,
-                "seq_id": seq_id,
-                "session_id": session_id,
-                "provider_type": provider_type,
-            }
-        )
+    # Built column by column, rather than as one dict per row
+    index_columns = {col: [row[col] for row in metadata_rows] for col in _INDEX_COLUMNS}
 
+    for response_id, metadata_json, provider_type in zip(
+        index_columns["response_id"],
+        (row["metadata"] for row in metadata_rows),
+        index_columns["provider_type"],
+    ):
         if metadata_json and provider_type in provider_to_meta:
             provider_to_meta[provider_type].append(
                 (
@@ -74,8 +65,8 @@ def sequester_metadata(
         #         response_df.select("response_id").to_series().to_list()
         #     )
 
-    response_ids_to_delete = master_index.commit(
-        mode="append", receipt_col="response_id"
+    response_ids_to_delete = master_index.write(
+        index_columns, mode="append", receipt_col="response_id"
     )
     if response_ids_to_delete is not None:
         response_ids_to_delete = (
@@ -86,9 +77,7 @@ def sequester_metadata(
 
 
 def _sequester_dfs(dfs: dict[str, pl.DataFrame], folder: Path, provider_type: str):
-    # Create metadata directory
-    folder.mkdir(parents=True, exist_ok=True)
-
+    # write_to_parquet creates the folder if needed
     for df_name, df in dfs.items():
         if df.is_empty():
             continue
@@ -35,34 +35,42 @@ def write_to_parquet(
         commit = pl.DataFrame(data, schema=schema)
 
     receipt_value = None
-    parquet_fpath.parent.mkdir(parents=True, exist_ok=True)
     if parquet_fpath.exists():
-        existing = pl.read_parquet(parquet_fpath)
         if mode in ["append", "unique"]:
+            # Existing rows are streamed into the new file, not loaded into memory
+            existing = pl.scan_parquet(parquet_fpath)
             if mode == "unique":
-                commit = commit.join(existing, on=on, how="anti")
+                commit = commit.join(existing.select(on).collect(), on=on, how="anti")
 
-            write_value = pl.concat([existing, commit], how="diagonal_relaxed")
+            write_value = pl.concat([existing, commit.lazy()], how="diagonal_relaxed")
         elif mode == "update":
+            existing = pl.read_parquet(parquet_fpath)
             write_value = existing.update(commit, on=on)
         elif mode == "replace":
             write_value = commit
         else:
             raise ValueError(f"Unknown mode: {mode}")
     else:
+        # Only a new file can be missing its directory
+        parquet_fpath.parent.mkdir(parents=True, exist_ok=True)
         write_value = commit
 
     if receipt_col:
         receipt_value = commit.select(receipt_col)
 
     tmp_fpath = parquet_fpath.with_suffix(".tmp")
-    write_value.write_parquet(tmp_fpath)
+    if isinstance(write_value, pl.LazyFrame):
+        write_value.sink_parquet(tmp_fpath)
+    else:
+        write_value.write_parquet(tmp_fpath)
     tmp_fpath.replace(parquet_fpath)
 
     return receipt_value
 
 
 class ParquetWriter:
+    __slots__ = ("parquet_fpath", "_log", "schema")
+
     def __init__(self, parquet_fpath: Path, schema=None):
         """
         Manages a single Parquet file (akin to a table).
@@ -81,7 +89,12 @@ class ParquetWriter:
         receipt_col: Union[str, list[str]] = None,
     ):
         return write_to_parquet(
-            self.parquet_fpath, data, mode=mode, on=on, receipt_col=receipt_col
+            self.parquet_fpath,
+            data,
+            mode=mode,
+            on=on,
+            schema=self.schema,
+            receipt_col=receipt_col,
         )
 
     def log(self, item: dict):
@@ -106,11 +119,27 @@ class ParquetWriter:
         self._log = []
         return ret
 
-    def get(self, item: dict):
-        """Retrieve items. Ignores any uncommitted items."""
-        df = pl.read_parquet(self.parquet_fpath)
-        query_df = pl.DataFrame([item])
-        result_df = df.join(
-            query_df, on=list(item.keys()), how="semi", nulls_equal=True
+    def get(
+        self,
+        item: dict,
+        limit: Optional[int] = None,
+        columns: Optional[list[str]] = None,
+    ):
+        """
+        Retrieve items. Ignores any uncommitted items.
+
+        :param item: Column values to match. None matches nulls.
+        :param limit: If set, stop after this many matching rows.
+        :param columns: If set, only read these columns.
+        """
+        # Filtering a lazy scan lets the reader skip row groups that cannot match,
+        # instead of loading the whole file.
+        predicate = pl.all_horizontal(
+            [pl.col(key).eq_missing(value) for key, value in item.items()]
         )
-        return result_df
+        lf = pl.scan_parquet(self.parquet_fpath).filter(predicate)
+        if limit is not None:
+            lf = lf.head(limit)
+        if columns is not None:
+            lf = lf.select(columns)
+        return lf.collect()
@@ -65,6 +65,19 @@ class Throttler:
             delay = (oldest_timestamp + self._window_seconds) - current_time
             return max(0.0, delay)
 
+    def acquire(self) -> None:
+        """
+        Block until a request may be submitted, then record it.
+
+        Safe to call from several threads at once.
+        """
+        while True:
+            # calculate_delay() records the request when it returns 0
+            delay = self.calculate_delay()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
     def record_request(self, timestamp: Optional[float] = None) -> None:
         """
         Record a request timestamp.
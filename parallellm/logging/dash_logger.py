@@ -312,3 +312,16 @@ class PrimitiveDashboardLogger(DashboardLogger):
         pass
 
     # ask_for_confirmation and confirm_batch_submission remain unchanged
+
+
+def logs_hashes(dash_logger: DashboardLogger) -> bool:
+    """
+    Check whether a dashboard logger does anything with hash updates.
+
+    :param dash_logger: The dashboard logger to check
+    :returns: False if there is no logger, or its update_hash is the no-op
+        from PrimitiveDashboardLogger
+    """
+    if dash_logger is None:
+        return False
+    return type(dash_logger).update_hash is not PrimitiveDashboardLogger.update_hash
@@ -1,3 +1,4 @@
+import io
 import json
 from pathlib import Path
 from typing import TYPE_CHECKING, List, Optional, Union
@@ -496,8 +497,8 @@ class BatchGoogleProvider(BatchProvider, GoogleProvider):
                     content_str = file_content.decode("utf-8")
 
                     parsed_responses = []
-                    for line in content_str.strip().split("\n"):
-                        if line:
+                    for line in io.StringIO(content_str):
+                        if not line.isspace():
                             try:
                                 line_data = json.loads(line)
                                 custom_id = line_data.get("key", "unknown")
@@ -4,6 +4,7 @@ from typing import List
 
 import polars as pl
 
+from parallellm.utils import fastjson
 from parallellm.utils.manip import to_snake_case
 
 
@@ -107,7 +108,9 @@ def fix_to_snake_case(obj: dict) -> dict:
 
 def google_metadata_sinker(metas: List[str]):
     objs = [
-        {**as_is, **json.loads(astring)} for as_is, astring in metas if astring.strip()
+        {**as_is, **fastjson.loads(astring)}
+        for as_is, astring in metas
+        if astring.strip()
     ]
 
     # custom handle messages
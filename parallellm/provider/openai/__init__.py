@@ -1,3 +1,4 @@
+import io
 import json
 from pathlib import Path
 from typing import TYPE_CHECKING, List, Optional, Union
@@ -399,8 +400,8 @@ class BatchOpenAIProvider(BatchProvider, OpenAIProvider):
         try:
             parsed_results = [
                 self._decode_openai_batch_result(json.loads(line))
-                for line in out_content.strip().split("\n")
-                if line
+                for line in io.StringIO(out_content)
+                if not line.isspace()
             ]
             suc_res = BatchResult(
                 status="ready",
@@ -422,8 +423,8 @@ class BatchOpenAIProvider(BatchProvider, OpenAIProvider):
             try:
                 parsed_errors = [
                     self._decode_openai_batch_error(json.loads(line))
-                    for line in err_content.strip().split("\n")
-                    if line
+                    for line in io.StringIO(err_content)
+                    if not line.isspace()
                 ]
                 err_res = BatchResult(
                     status="error",
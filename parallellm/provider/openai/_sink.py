@@ -4,6 +4,8 @@ from typing import List
 
 import polars as pl
 
+from parallellm.utils import fastjson
+
 
 def openai_message_sinker(meta: dict, *, remove_content=True):
     # standardize an openai message.
@@ -34,7 +36,9 @@ def openai_metadata_sinker(metas: List[tuple[str, str]]):
     Input: List of tuples of (response_id, metadata_json)
     """
     objs = [
-        {**as_is, **json.loads(astring)} for as_is, astring in metas if astring.strip()
+        {**as_is, **fastjson.loads(astring)}
+        for as_is, astring in metas
+        if astring.strip()
     ]
 
     messages_df = None
@@ -232,3 +232,12 @@ class MinorTweaks:
 
     batch_wait_until_complete: bool = True
     "Whether to wait for all batches to complete before proceeding."
+
+    batch_submission_tps: Optional[float] = None
+    "Maximum number of batch submissions per second (None = no limit)."
+
+    def __post_init__(self):
+        if self.batch_submission_tps is not None and self.batch_submission_tps <= 0:
+            raise ValueError(
+                f"batch_submission_tps must be positive, got {self.batch_submission_tps}"
+            )
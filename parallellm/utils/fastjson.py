@@ -0,0 +1,70 @@
+import json
+import math
+from typing import Union
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def dumps_bytes(obj) -> bytes:
+    """
+    Serialize an object to compact UTF-8 JSON bytes.
+
+    Uses orjson when it is installed, otherwise the standard library.
+    Either way, NaN and Infinity are written as the standard library writes them.
+
+    :param obj: The object to serialize
+    :returns: The JSON encoding of obj
+    """
+    if HAS_ORJSON:
+        try:
+            out = orjson.dumps(obj)
+        except TypeError:
+            # orjson is stricter (e.g. non-str keys, big ints)
+            pass
+        else:
+            # orjson silently writes NaN/Infinity as null
+            if b"null" not in out or not _has_non_finite(obj):
+                return out
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _has_non_finite(obj) -> bool:
+    """Whether obj contains a NaN or infinite float"""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(v) for v in obj)
+    return False
+
+
+def dumps(obj) -> str:
+    """
+    Serialize an object to a compact JSON string.
+
+    :param obj: The object to serialize
+    :returns: The JSON encoding of obj
+    """
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def loads(data: Union[str, bytes]):
+    """
+    Deserialize JSON, using orjson when it is installed.
+
+    :param data: The JSON document
+    :returns: The decoded object
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN/Infinity, which the standard library writes
+            pass
+    return json.loads(data)
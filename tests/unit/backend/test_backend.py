@@ -224,9 +224,13 @@ class TestSyncBackend:
         assert resp_metadata is not None
 
         # Check that result is stored in pending results
-        key = f"{sample_call_id['doc_hash']}:{sample_call_id['seq_id']}"
+        key = (
+            sample_call_id["agent_name"],
+            sample_call_id["doc_hash"],
+            sample_call_id["seq_id"],
+        )
         assert key in backend._pending_results
-        assert backend._pending_results[key] == resp_text
+        assert backend._pending_results[key].text == resp_text
 
     def test_sync_backend_retrieve(self, file_manager, sample_call_id):
         """Test retrieving data from SyncBackend"""
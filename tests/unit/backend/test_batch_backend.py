@@ -0,0 +1,359 @@
+"""
+Unit tests for BatchBackend batch assembly and submission
+"""
+
+import json
+import pytest
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+from parallellm.core.backend.batch_backend import BatchBackend
+from parallellm.core.exception import NotAvailable
+from parallellm.core.identity import LLMIdentity
+from parallellm.file_io.file_manager import FileManager
+from parallellm.logging.dash_logger import PrimitiveDashboardLogger
+from parallellm.provider.base import BatchProvider
+from parallellm.types import BatchResult, MinorTweaks, ParsedResponse
+
+
+class FakeBatchProvider(BatchProvider):
+    provider_type = "openai"
+
+    def __init__(self):
+        self.submitted = []
+
+    def prepare_batch_call(self, params, custom_id, **kwargs):
+        return {"custom_id": custom_id, "body": params["documents"]}
+
+    def get_batch_custom_ids(self, stuff):
+        return [s["custom_id"] for s in stuff]
+
+    def submit_batch_to_provider(self, fpath, llm):
+        self.submitted.append((fpath, llm))
+        return f"batch_{len(self.submitted)}"
+
+    def download_batch(self, batch_uuid):
+        fpath, _ = self.submitted[int(batch_uuid.split("_")[1]) - 1]
+        with open(fpath, encoding="utf-8") as f:
+            custom_ids = [json.loads(line)["custom_id"] for line in f]
+        return [
+            BatchResult(
+                status="ready",
+                raw_output=[{"custom_id": cid} for cid in custom_ids],
+                parsed_responses=[
+                    ParsedResponse(text=f"done {cid}", response_id=cid, metadata=None)
+                    for cid in custom_ids
+                ],
+            )
+        ]
+
+
+@pytest.fixture
+def backend():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fm = FileManager(Path(temp_dir))
+        with BatchBackend(fm, session_id=fm._get_session_counter()) as backend:
+            yield backend
+
+
+def _submit(backend, provider, seq_id, model_name="gpt-4.1-nano"):
+    call_id = {
+        "agent_name": "batch_agent",
+        "doc_hash": f"hash_{seq_id}",
+        "seq_id": seq_id,
+        "session_id": backend.session_id,
+        "provider_type": "openai",
+    }
+    params = {
+        "instructions": None,
+        "documents": [f"doc {seq_id}"],
+        "llm": LLMIdentity(model_name, provider="openai"),
+        "text_format": None,
+        "tools": None,
+    }
+    with pytest.raises(NotAvailable):
+        backend.submit_query(provider, params, call_id=call_id)
+    return call_id
+
+
+class TestExecuteBatch:
+    def test_partition_and_chunking(self, backend):
+        """Calls are split by model name, then into chunks of max_batch_size"""
+        provider = FakeBatchProvider()
+        for i in range(5):
+            _submit(backend, provider, i, model_name="model-a")
+        for i in range(5, 7):
+            _submit(backend, provider, i, model_name="model-b")
+
+        cohort = backend.execute_batch(
+            provider, PrimitiveDashboardLogger(), max_batch_size=2
+        )
+
+        sizes = [len(b.call_ids) for b in cohort.batch_ids]
+        assert sizes == [2, 2, 1, 2]
+        assert [llm for _, llm in provider.submitted] == [
+            "model-a",
+            "model-a",
+            "model-a",
+            "model-b",
+        ]
+        seq_ids = [c["seq_id"] for b in cohort.batch_ids for c in b.call_ids]
+        assert seq_ids == list(range(7))
+
+        # Everything submitted is tracked as pending
+        assert backend._ds.get_all_pending_batch_uuids() == sorted(
+            b.batch_uuid for b in cohort.batch_ids
+        )
+        assert not backend._batch_call_ids
+
+    def test_no_partition(self, backend):
+        """Without partitioning, only max_batch_size splits the buffer"""
+        provider = FakeBatchProvider()
+        for i in range(3):
+            _submit(backend, provider, i, model_name=f"model-{i}")
+
+        cohort = backend.execute_batch(
+            provider,
+            PrimitiveDashboardLogger(),
+            max_batch_size=2,
+            partition_by_model_name=False,
+        )
+
+        assert [len(b.call_ids) for b in cohort.batch_ids] == [2, 1]
+
+    def test_skip_calls_already_pending(self, backend):
+        """Calls already in a pending batch are not submitted again"""
+        provider = FakeBatchProvider()
+        for i in range(3):
+            _submit(backend, provider, i)
+        backend.execute_batch(provider, PrimitiveDashboardLogger())
+
+        for i in range(5):
+            _submit(backend, provider, i)
+        cohort = backend.execute_batch(provider, PrimitiveDashboardLogger())
+
+        assert [c["seq_id"] for b in cohort.batch_ids for c in b.call_ids] == [3, 4]
+
+    def test_precheck_skips_datastore_without_pending(self, backend):
+        """Without known pending calls, the datastore is not queried per call"""
+        provider = FakeBatchProvider()
+        with patch.object(backend._ds, "is_call_in_pending_batch_many") as mock_check:
+            for i in range(3):
+                _submit(backend, provider, i)
+            backend.execute_batch(provider, PrimitiveDashboardLogger())
+            mock_check.assert_not_called()
+
+        assert backend._pending_keys == {("batch_agent", f"hash_{i}") for i in range(3)}
+
+    def test_dedupe_buffered_calls(self, backend):
+        """The same call submitted twice before execution is batched once"""
+        provider = FakeBatchProvider()
+        for i in [0, 1, 0, 1, 2]:
+            _submit(backend, provider, i)
+
+        cohort = backend.execute_batch(provider, PrimitiveDashboardLogger())
+        assert [c["seq_id"] for b in cohort.batch_ids for c in b.call_ids] == [0, 1, 2]
+
+        # After execution, the call may be buffered again
+        _submit(backend, provider, 3)
+        assert backend._buffered_keys == {("batch_agent", "hash_3", 3)}
+
+    def test_retry_after_failed_prepare(self, backend):
+        """A call that failed to prepare is not marked as buffered"""
+
+        class FailOnceProvider(FakeBatchProvider):
+            fail = True
+
+            def prepare_batch_call(self, params, custom_id, **kwargs):
+                if self.fail:
+                    self.fail = False
+                    raise ValueError("bad params")
+                return super().prepare_batch_call(params, custom_id, **kwargs)
+
+        provider = FailOnceProvider()
+        with pytest.raises(ValueError):
+            _submit(backend, provider, 0)
+        assert backend._buffered_keys == set()
+
+        _submit(backend, provider, 0)
+        cohort = backend.execute_batch(provider, PrimitiveDashboardLogger())
+        assert [c["seq_id"] for b in cohort.batch_ids for c in b.call_ids] == [0]
+
+    def test_precheck_flush(self, backend):
+        """The precheck queue is flushed once it reaches the flush size"""
+        provider = FakeBatchProvider()
+        backend._precheck_flush_size = 2
+        for i in range(3):
+            _submit(backend, provider, i)
+
+        assert len(backend._batch_call_ids) == 2
+        assert len(backend._precheck_queue) == 1
+
+    def test_submission_order(self, backend):
+        """Concurrently submitted batches keep their original order"""
+
+        class SlowFirstProvider(FakeBatchProvider):
+            def submit_batch_to_provider(self, fpath, llm):
+                # Batches submitted earlier finish later
+                time.sleep(0.05 * (2 - int(llm.split("-")[1])))
+                return f"batch_{llm}"
+
+        provider = SlowFirstProvider()
+        for i in range(3):
+            _submit(backend, provider, i, model_name=f"model-{i}")
+
+        cohort = backend.execute_batch(provider, PrimitiveDashboardLogger())
+
+        assert [b.call_ids[0]["seq_id"] for b in cohort.batch_ids] == [0, 1, 2]
+        assert [b.batch_uuid for b in cohort.batch_ids] == [
+            "batch_model-0",
+            "batch_model-1",
+            "batch_model-2",
+        ]
+
+    def test_submission_failure(self, backend):
+        """Batches that were submitted are tracked even if another one fails"""
+
+        class FailingProvider(FakeBatchProvider):
+            def submit_batch_to_provider(self, fpath, llm):
+                if llm == "model-1":
+                    raise RuntimeError("submission failed")
+                return f"batch_{llm}"
+
+        provider = FailingProvider()
+        for i in range(3):
+            _submit(backend, provider, i, model_name=f"model-{i}")
+
+        with pytest.raises(RuntimeError):
+            backend.execute_batch(provider, PrimitiveDashboardLogger())
+
+        assert backend._ds.get_all_pending_batch_uuids() == [
+            "batch_model-0",
+            "batch_model-2",
+        ]
+
+        # Only the failed batch's call is left to retry
+        assert [c["seq_id"] for c in backend._batch_call_ids] == [1]
+        assert backend._batch_model_names == ["model-1"]
+        assert backend._buffered_keys == {("batch_agent", "hash_1", 1)}
+
+    def test_submission_tps(self, tmp_path):
+        """Submissions are rate limited when submission_tps is set"""
+        fm = FileManager(tmp_path)
+        with BatchBackend(
+            fm, session_id=fm._get_session_counter(), submission_tps=10
+        ) as backend:
+            provider = FakeBatchProvider()
+            for i in range(3):
+                _submit(backend, provider, i)
+
+            start = time.time()
+            backend.execute_batch(
+                provider, PrimitiveDashboardLogger(), max_batch_size=1
+            )
+            assert time.time() - start < 1
+
+            assert backend._submission_throttler.get_current_request_count() == 3
+
+    @pytest.mark.parametrize("tps", [0, -1])
+    def test_invalid_submission_tps(self, tmp_path, tps):
+        """A non-positive rate is rejected up front"""
+        fm = FileManager(tmp_path)
+        with pytest.raises(ValueError):
+            BatchBackend(fm, session_id=fm._get_session_counter(), submission_tps=tps)
+        with pytest.raises(ValueError):
+            MinorTweaks(batch_submission_tps=tps)
+
+    def test_no_submission_tps(self, backend):
+        """Without submission_tps there is no throttler to consult"""
+        assert backend._submission_throttler is None
+        provider = FakeBatchProvider()
+        _submit(backend, provider, 0)
+        backend.execute_batch(provider, PrimitiveDashboardLogger())
+        assert backend._ds.get_all_pending_batch_uuids()
+
+
+class TestDownload:
+    def test_try_download_all_batches(self, backend):
+        """All pending batches are downloaded, stored, and cleared"""
+        provider = FakeBatchProvider()
+        call_ids = [_submit(backend, provider, i) for i in range(5)]
+        cohort = backend.execute_batch(
+            provider, PrimitiveDashboardLogger(), max_batch_size=2
+        )
+        assert len(cohort.batch_ids) == 3
+
+        statuses = backend.try_download_all_batches(
+            provider, PrimitiveDashboardLogger()
+        )
+
+        assert statuses == {"pending": 0, "ready": 3, "error": 0}
+        assert backend._ds.get_all_pending_batch_uuids() == []
+        for call_id in call_ids:
+            assert backend.retrieve(call_id).text.startswith("done ")
+        assert len(list(backend._fm.allocate_batch_out().glob("*.zip"))) == 3
+
+    def test_failed_download_does_not_block_others(self, backend):
+        """Finished batches are stored even if another batch fails to download"""
+
+        class FlakyProvider(FakeBatchProvider):
+            def download_batch(self, batch_uuid):
+                if batch_uuid == "batch_2":
+                    raise ConnectionError("network down")
+                return super().download_batch(batch_uuid)
+
+        provider = FlakyProvider()
+        call_ids = [_submit(backend, provider, i) for i in range(4)]
+        backend.execute_batch(provider, PrimitiveDashboardLogger(), max_batch_size=2)
+
+        statuses = backend.try_download_all_batches(
+            provider, PrimitiveDashboardLogger()
+        )
+
+        assert statuses == {"pending": 0, "ready": 1, "error": 1}
+        assert backend._ds.get_all_pending_batch_uuids() == ["batch_2"]
+        assert backend.retrieve(call_ids[0]).text.startswith("done ")
+        assert backend.retrieve(call_ids[2]) is None
+
+
+class TestPersistToZip:
+    def test_jsonl_roundtrip(self, backend, tmp_path):
+        """Records are written as compressed jsonl"""
+        records = [{"custom_id": f"c{i}", "value": i} for i in range(10)]
+        fpath = tmp_path / "out.zip"
+        backend.persist_to_zip(records, fpath, inner_fname="inner")
+
+        with zipfile.ZipFile(fpath) as zf:
+            info = zf.getinfo("inner.jsonl")
+            assert info.compress_type == zipfile.ZIP_DEFLATED
+            lines = zf.read("inner.jsonl").decode("utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == records
+
+    def test_string(self, backend, tmp_path):
+        """A string is written as a single file"""
+        fpath = tmp_path / "raw.zip"
+        backend.persist_to_zip("raw output", fpath)
+
+        with zipfile.ZipFile(fpath) as zf:
+            assert zf.read("raw") == b"raw output"
+
+    def test_large_string(self, backend, tmp_path):
+        """A string spanning several write slices is written intact"""
+        raw = "".join(f'{{"line": {i}, "text": "héllo"}}\n' for i in range(100_000))
+        fpath = tmp_path / "big.zip"
+        backend.persist_to_zip(raw, fpath, inner_fname="big.jsonl")
+
+        with zipfile.ZipFile(fpath) as zf:
+            assert zf.read("big.jsonl").decode("utf-8") == raw
+
+    def test_generator(self, backend, tmp_path):
+        """Records may be streamed from a generator"""
+        fpath = tmp_path / "gen.zip"
+        backend.persist_to_zip(({"i": i} for i in range(3)), fpath, inner_fname="gen")
+
+        with zipfile.ZipFile(fpath) as zf:
+            lines = zf.read("gen.jsonl").decode("utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == [{"i": i} for i in range(3)]
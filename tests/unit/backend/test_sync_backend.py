@@ -0,0 +1,344 @@
+"""
+Unit tests for SyncBackend
+"""
+
+import gc
+import pytest
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from parallellm.core.backend.sync_backend import SyncBackend
+from parallellm.core.identity import LLMIdentity
+from parallellm.core.throttler import Throttler
+from parallellm.file_io.file_manager import FileManager
+from parallellm.logging.dash_logger import (
+    DashboardLogger,
+    HashStatus,
+    PrimitiveDashboardLogger,
+    logs_hashes,
+)
+from parallellm.provider.base import SyncProvider
+from parallellm.types import ParsedResponse
+
+
+class FakeSyncProvider(SyncProvider):
+    provider_type = "openai"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    def prepare_sync_call(self, params, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("provider failure")
+        return params["documents"][0]
+
+    def parse_response(self, raw_response):
+        return ParsedResponse(
+            text=f"echo {raw_response}",
+            response_id=f"resp_{self.calls}",
+            metadata={"n": self.calls},
+        )
+
+
+@pytest.fixture
+def backend():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with SyncBackend(FileManager(Path(temp_dir))) as backend:
+            yield backend
+
+
+def _call_id(seq_id, agent_name="sync_agent"):
+    return {
+        "agent_name": agent_name,
+        "doc_hash": f"hash_{seq_id}",
+        "seq_id": seq_id,
+        "session_id": 1,
+        "provider_type": "openai",
+    }
+
+
+def _params(doc):
+    return {
+        "instructions": None,
+        "documents": [doc],
+        "llm": LLMIdentity("gpt-4.1-nano", provider="openai"),
+        "text_format": None,
+        "tools": None,
+    }
+
+
+class TestPendingResults:
+    def test_retrieve_pending(self, backend):
+        """A submitted call is served from pending results"""
+        call_id = _call_id(0)
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=call_id)
+
+        key = ("sync_agent", "hash_0", 0)
+        assert backend._pending_results[key].text == "echo hi"
+
+        with patch.object(backend._ds, "retrieve") as mock_retrieve:
+            assert backend.retrieve(call_id).text == "echo hi"
+            mock_retrieve.assert_not_called()
+
+    def test_retrieve_other_agent(self, backend):
+        """Pending results are keyed by agent name"""
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+
+        assert backend.retrieve(_call_id(0, agent_name="other_agent")) is None
+
+    def test_retrieve_metadata_from_datastore(self, backend):
+        """Metadata is read from the datastore"""
+        call_id = _call_id(0)
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=call_id)
+
+        result = backend.retrieve(call_id, metadata=True)
+        assert result.metadata == {"n": 1}
+
+    def test_retry_after_failure(self, backend):
+        """A failed call is not cached, so a retry reaches the provider again"""
+        call_id = _call_id(0)
+        provider = FakeSyncProvider(fail=True)
+        with pytest.raises(RuntimeError):
+            backend.submit_query(provider, _params("hi"), call_id=call_id)
+
+        assert backend.retrieve(call_id) is None
+
+        provider.fail = False
+        backend.submit_query(provider, _params("hi"), call_id=call_id)
+        assert provider.calls == 2
+        assert backend.retrieve(call_id).text == "echo hi"
+
+    def test_pending_results_bounded(self, backend):
+        """Only the most recent results are kept; older ones come from the datastore"""
+        backend._max_pending_results = 2
+        provider = FakeSyncProvider()
+        for i in range(3):
+            backend.submit_query(provider, _params(f"doc {i}"), call_id=_call_id(i))
+
+        assert list(backend._pending_results) == [
+            ("sync_agent", "hash_1", 1),
+            ("sync_agent", "hash_2", 2),
+        ]
+        assert backend.retrieve(_call_id(0)).text == "echo doc 0"
+
+
+class TestWriteBuffer:
+    def test_buffered_until_flush_size(self, backend):
+        """Fast responses are written together once flush_size is reached"""
+        backend._flush_size = 3
+        backend._flush_interval_s = 60
+        provider = FakeSyncProvider()
+
+        store_many = backend._ds.store_many
+        sizes = []
+
+        def record_size(items, **kwargs):
+            sizes.append(len(items))
+            store_many(items, **kwargs)
+
+        with patch.object(backend._ds, "store_many", side_effect=record_size):
+            for i in range(4):
+                backend.submit_query(provider, _params(f"doc {i}"), call_id=_call_id(i))
+
+        assert sizes == [3]
+        assert len(backend._write_buffer) == 1
+
+    def test_flush_on_interval(self, backend):
+        """A response is written right away once the flush interval has passed"""
+        backend._flush_interval_s = 0
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+
+        assert backend._write_buffer == []
+        assert backend._ds.retrieve(_call_id(0)).text == "echo hi"
+
+    def test_flush_before_datastore_read(self, backend):
+        """Buffered responses are visible through the datastore fallback"""
+        backend._flush_interval_s = 60
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+        assert backend._write_buffer
+
+        result = backend.retrieve(_call_id(0), metadata=True)
+        assert result.text == "echo hi"
+        assert backend._write_buffer == []
+
+    def test_flush_on_persist(self, backend):
+        """persist() writes any buffered responses"""
+        backend._flush_interval_s = 60
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+
+        backend.persist()
+        assert backend._ds.retrieve(_call_id(0)).text == "echo hi"
+
+    def test_unserializable_metadata_fails_only_its_call(self, backend):
+        """A response whose metadata cannot be stored is never buffered"""
+        backend._flush_interval_s = 60
+
+        class SetMetadataProvider(FakeSyncProvider):
+            def parse_response(self, raw_response):
+                return ParsedResponse(
+                    text="bad", response_id="r", metadata={"s": {1, 2}}
+                )
+
+        with pytest.raises(TypeError):
+            backend.submit_query(
+                SetMetadataProvider(), _params("bad"), call_id=_call_id(0)
+            )
+        assert backend._write_buffer == []
+
+        for i in range(1, 4):
+            backend.submit_query(
+                FakeSyncProvider(), _params(f"doc {i}"), call_id=_call_id(i)
+            )
+        backend.close()
+
+    def test_failed_item_does_not_block_others(self, backend):
+        """If one buffered response cannot be written, the rest still are, and it is kept"""
+        backend._flush_interval_s = 60
+        provider = FakeSyncProvider()
+        for i in range(3):
+            backend.submit_query(provider, _params(f"doc {i}"), call_id=_call_id(i))
+
+        _store = backend._ds._store
+
+        def fail_one(conn, call_id, parsed_response, **kwargs):
+            if call_id["seq_id"] == 1:
+                raise ValueError("bad row")
+            _store(conn, call_id, parsed_response, **kwargs)
+
+        with patch.object(backend._ds, "_store", side_effect=fail_one):
+            backend._flush_writes()
+            assert [c["seq_id"] for c, _ in backend._write_buffer] == [1]
+
+            # persist() does not let it go unnoticed
+            with pytest.raises(RuntimeError):
+                backend.persist()
+
+        assert backend._ds.retrieve(_call_id(0)).text == "echo doc 0"
+        assert backend._ds.retrieve(_call_id(2)).text == "echo doc 2"
+
+        # Written by the next flush
+        backend.persist()
+        assert backend._write_buffer == []
+        assert backend._ds.retrieve(_call_id(1)).text == "echo doc 1"
+
+    def test_durable_writes_through(self, backend):
+        """A durable call is written before submit_query returns"""
+        backend._flush_interval_s = 60
+        backend.submit_query(
+            FakeSyncProvider(), _params("hi"), call_id=_call_id(0), durable=True
+        )
+
+        assert backend._write_buffer == []
+        assert backend._ds.retrieve(_call_id(0)).text == "echo hi"
+
+    def test_flush_at_exit(self, tmp_path):
+        """Responses still buffered are written when the backend is collected"""
+        backend = SyncBackend(FileManager(tmp_path), flush_interval_s=60)
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+        assert backend._write_buffer
+
+        finalizer = backend._finalizer
+        del backend
+        gc.collect()
+        assert not finalizer.alive
+
+        with SyncBackend(FileManager(tmp_path)) as reopened:
+            assert reopened.retrieve(_call_id(0)).text == "echo hi"
+
+
+class TestClose:
+    def test_close_is_idempotent(self, backend):
+        """Only the first close flushes and releases the datastore"""
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+        with (
+            patch.object(backend._ds, "store_many") as store_many,
+            patch.object(backend._ds, "close") as close,
+        ):
+            backend.close()
+            backend.close()
+        assert store_many.call_count == 1
+        assert close.call_count == 1
+
+    def test_close_releases_after_failed_flush(self, backend):
+        """The datastore is closed even if the final flush raises"""
+        with (
+            patch.object(SyncBackend, "_flush_writes", side_effect=OSError("disk")),
+            patch.object(backend._ds, "close") as close,
+        ):
+            with pytest.raises(OSError):
+                backend.close()
+        assert close.call_count == 1
+
+    def test_datastore_without_close(self):
+        """Datastores inherit a no-op close"""
+        from parallellm.testing.simple_backend import MockDatastore
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            backend = SyncBackend(
+                FileManager(Path(temp_dir)), datastore_cls=MockDatastore
+            )
+            backend.close()
+
+
+class TestThrottling:
+    def test_disabled_by_default(self, backend):
+        """Without a throttler, the throttler is never consulted"""
+        assert not backend._throttle_enabled
+        with patch.object(backend._throttler, "calculate_delay") as mock_delay:
+            backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+            mock_delay.assert_not_called()
+
+    def test_throttled(self, tmp_path):
+        """Requests beyond the window limit wait for room in the window"""
+        throttler = Throttler(max_requests_per_window=2, window_seconds=0.2)
+        with SyncBackend(FileManager(tmp_path), throttler=throttler) as backend:
+            provider = FakeSyncProvider()
+            start = time.time()
+            for i in range(3):
+                backend.submit_query(provider, _params("hi"), call_id=_call_id(i))
+            assert time.time() - start >= 0.15
+            assert throttler.get_current_request_count() <= 2
+
+
+class TestDashboardLogging:
+    def test_logging_off_critical_path(self, backend):
+        """A slow dashboard does not block submit_query"""
+        release = threading.Event()
+        updates = []
+
+        class SlowDashboard(PrimitiveDashboardLogger):
+            def update_hash(self, full_hash, status):
+                release.wait(timeout=5)
+                updates.append((full_hash, status))
+
+        backend.dash_logger = SlowDashboard()
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+        assert updates == []
+
+        release.set()
+        backend.close()
+        assert updates == [
+            ("hash_0", HashStatus.SENT),
+            ("hash_0", HashStatus.RECEIVED),
+        ]
+
+    def test_primitive_logger_skips_thread(self, backend):
+        """The default no-op logger does not start the logging thread"""
+        backend.submit_query(FakeSyncProvider(), _params("hi"), call_id=_call_id(0))
+        assert backend._log_thread is None
+
+
+def test_logs_hashes():
+    class Custom(PrimitiveDashboardLogger):
+        def update_hash(self, full_hash, status):
+            pass
+
+    assert not logs_hashes(PrimitiveDashboardLogger())
+    assert logs_hashes(Custom())
+    assert logs_hashes(DashboardLogger())
+    assert not logs_hashes(None)
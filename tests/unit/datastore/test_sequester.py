@@ -74,6 +74,55 @@ def test_sequester_metadata(test_wkdir):
     conn.close()
 
 
+def test_sequester_metadata_index(test_wkdir):
+    """Every transferred row is recorded in the metadata index"""
+    fm = FileManager(test_wkdir)
+    ds = SQLiteDatastore(fm)
+    rows = (
+        ds._get_connection()
+        .execute(
+            "SELECT response_id, provider_type FROM metadata"
+            " WHERE provider_type IN ('openai', 'google') OR provider_type IS NULL"
+        )
+        .fetchall()
+    )
+
+    ds._transfer_metadata_to_parquet()
+
+    index = pl.read_parquet(
+        fm.allocate_datastore() / "apimeta" / "metadata-index.parquet"
+    )
+    assert index.columns == [
+        "response_id",
+        "agent_name",
+        "seq_id",
+        "session_id",
+        "provider_type",
+    ]
+    assert sorted(index["response_id"].to_list()) == sorted(
+        row["response_id"] for row in rows
+    )
+    ds.close()
+
+
+def test_transfer_in_batches(test_wkdir, monkeypatch):
+    """Transferring in small batches moves the same rows as one large batch"""
+    monkeypatch.setattr("parallellm.core.datastore.sqlite._TRANSFER_BATCH_SIZE", 2)
+    fm = FileManager(test_wkdir)
+    ds = SQLiteDatastore(fm)
+    conn = ds._get_connection()
+
+    ds._transfer_metadata_to_parquet()
+
+    assert conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0] == 3
+    index = pl.read_parquet(
+        fm.allocate_datastore() / "apimeta" / "metadata-index.parquet"
+    )
+    assert index.height == 6
+    assert index["response_id"].is_unique().all()
+    ds.close()
+
+
 if __name__ == "__main__":
     # Debug
     wkdir = Path("experiments/debug-compress-test")
@@ -123,6 +123,122 @@ class TestSQLite:
         assert retrieved is not None
         assert retrieved.text == "Fallback response"
 
+    def test_retrieve_prefers_matching_seq_id(self, temp_datastore):
+        """A matching seq_id wins over older entries; otherwise the oldest entry is used"""
+        for seq_id in (0, 1, 1):
+            call_id: CallIdentifier = {
+                "agent_name": "prefer_agent",
+                "doc_hash": "prefer_hash",
+                "seq_id": seq_id,
+                "session_id": 100,
+                "provider_type": "openai",
+            }
+            temp_datastore.store(
+                call_id,
+                ParsedResponse(
+                    text=f"response {seq_id}",
+                    response_id=f"prefer_{seq_id}",
+                    metadata={},
+                ),
+            )
+
+        call_id["seq_id"] = 1
+        assert temp_datastore.retrieve(call_id).text == "response 1"
+        call_id["seq_id"] = 5
+        assert temp_datastore.retrieve(call_id).text == "response 0"
+        call_id["doc_hash"] = "missing_hash"
+        assert temp_datastore.retrieve(call_id) is None
+
+    def test_pragmas(self, temp_datastore):
+        """Test that performance PRAGMAs are applied by default"""
+        conn = temp_datastore._get_connection()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+
+    def test_pragmas_disabled(self):
+        """Test that PRAGMA tuning can be turned off"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            datastore = SQLiteDatastore(FileManager(Path(temp_dir)), tune_pragmas=False)
+            try:
+                conn = datastore._get_connection()
+                assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+            finally:
+                datastore.close()
+
+    def test_persist_optimizes(self, temp_datastore):
+        """Test that persist refreshes planner statistics before closing"""
+        statements = []
+        temp_datastore._get_connection().set_trace_callback(statements.append)
+        temp_datastore.persist()
+        assert "PRAGMA optimize" in statements
+
+    def test_transfer_deletes_many_sequestered_rows(self, temp_datastore):
+        """Deleting transferred metadata is not bound by SQLite's variable limit"""
+        for seq_id in range(3):
+            call_id = {
+                "agent_name": "transfer_agent",
+                "doc_hash": f"transfer_hash_{seq_id}",
+                "seq_id": seq_id,
+                "session_id": 1,
+                "provider_type": "openai",
+            }
+            temp_datastore.store(
+                call_id,
+                ParsedResponse(
+                    text="t", response_id=f"resp_{seq_id}", metadata={"a": seq_id}
+                ),
+            )
+
+        conn = temp_datastore._get_connection()
+        if not hasattr(conn, "setlimit"):
+            pytest.skip("Connection.setlimit requires Python 3.11")
+        conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+        sequestered = [f"resp_{i}" for i in range(2_000)]
+        with patch(
+            "parallellm.core.datastore.sqlite.sequester_metadata",
+            return_value=sequestered,
+        ):
+            temp_datastore._transfer_metadata_to_parquet()
+
+        assert conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0] == 0
+
+    def test_persist_skips_transfer_without_new_metadata(self, temp_datastore):
+        """Metadata is only moved to Parquet when some was stored since the last move"""
+        call_id = {
+            "agent_name": "dirty_agent",
+            "doc_hash": "dirty_hash",
+            "seq_id": 0,
+            "session_id": 1,
+            "provider_type": "openai",
+        }
+        temp_datastore._get_connection()
+        with patch.object(
+            temp_datastore, "_transfer_metadata_to_parquet"
+        ) as mock_transfer:
+            temp_datastore.persist()
+            assert mock_transfer.call_count == 1
+
+            # Nothing new: nothing to transfer
+            temp_datastore._get_connection()
+            temp_datastore.persist()
+            assert mock_transfer.call_count == 1
+
+            # Responses without metadata don't need a transfer either
+            temp_datastore.store(
+                call_id, ParsedResponse(text="t", response_id="r0", metadata=None)
+            )
+            temp_datastore.persist()
+            assert mock_transfer.call_count == 1
+
+            call_id["seq_id"] = 1
+            temp_datastore.store(
+                call_id, ParsedResponse(text="t", response_id="r1", metadata={"a": 1})
+            )
+            temp_datastore.persist()
+            assert mock_transfer.call_count == 2
+
 
 # @pytest.mark.skip("Takes extra time")
 class TestSQLiteBatch:
@@ -170,6 +286,71 @@ class TestSQLiteBatch:
         pending_uuids_after = temp_datastore.get_all_pending_batch_uuids()
         assert batch_uuid not in pending_uuids_after
 
+    def test_store_pending_batch_many(self, temp_datastore):
+        """Test storing several pending batches at once"""
+        batch_ids = []
+        for b in range(3):
+            call_ids = [
+                {
+                    "agent_name": "many_agent",
+                    "doc_hash": f"many_hash_{b}_{i}",
+                    "seq_id": i,
+                    "session_id": 350,
+                    "provider_type": "openai",
+                }
+                for i in range(2)
+            ]
+            batch_ids.append(
+                BatchIdentifier(
+                    call_ids=call_ids,
+                    custom_ids=[f"many_custom_{b}_{i}" for i in range(2)],
+                    batch_uuid=f"many-batch-uuid-{b}",
+                )
+            )
+
+        temp_datastore.store_pending_batch_many(batch_ids)
+
+        pending_uuids = temp_datastore.get_all_pending_batch_uuids()
+        assert pending_uuids == [f"many-batch-uuid-{b}" for b in range(3)]
+        for batch_id in batch_ids:
+            retrieved = temp_datastore.retrieve_batch_call_ids(batch_id.batch_uuid)
+            assert [c["doc_hash"] for c in retrieved] == [
+                c["doc_hash"] for c in batch_id.call_ids
+            ]
+
+    def test_is_call_in_pending_batch_many(self, temp_datastore):
+        """Test checking several calls against pending batches at once"""
+        call_ids = [
+            {
+                "agent_name": "check_agent",
+                "doc_hash": f"check_hash_{i}",
+                "seq_id": i,
+                "session_id": 360,
+                "provider_type": "openai",
+            }
+            for i in range(3)
+        ]
+        temp_datastore.store_pending_batch(
+            BatchIdentifier(
+                call_ids=call_ids[:2],
+                custom_ids=["check_custom_0", "check_custom_1"],
+                batch_uuid="check-batch-uuid",
+            )
+        )
+        other_agent = {**call_ids[0], "agent_name": "other_agent"}
+
+        assert temp_datastore.is_call_in_pending_batch_many([]) == []
+        assert temp_datastore.is_call_in_pending_batch_many(
+            [call_ids[2], call_ids[0], other_agent, call_ids[1]]
+        ) == [False, True, False, True]
+
+        temp_datastore.clear_batch_pending("check-batch-uuid")
+        assert temp_datastore.is_call_in_pending_batch_many(call_ids) == [
+            False,
+            False,
+            False,
+        ]
+
     def test_store_ready_batch(self, temp_datastore):
         """Test storing completed batch results"""
         # First store pending batch
@@ -216,6 +397,105 @@ class TestSQLiteBatch:
             assert retrieved is not None
             assert retrieved.text == f"Batch response {i + 1}"
 
+    def test_finalize_batches(self, temp_datastore):
+        """Test storing results and clearing pending records together"""
+        call_ids = [
+            {
+                "agent_name": "final_agent",
+                "doc_hash": f"final_hash_{i}",
+                "seq_id": i,
+                "session_id": 450,
+                "provider_type": "openai",
+            }
+            for i in range(2)
+        ]
+        temp_datastore.store_pending_batch_many(
+            [
+                BatchIdentifier(
+                    call_ids=[call_id],
+                    custom_ids=[f"final_custom_{i}"],
+                    batch_uuid=f"final-batch-uuid-{i}",
+                )
+                for i, call_id in enumerate(call_ids)
+            ]
+        )
+
+        results_by_uuid = {
+            "final-batch-uuid-0": [
+                BatchResult(
+                    status="ready",
+                    raw_output="ok",
+                    parsed_responses=[
+                        ParsedResponse(
+                            text="Final response 0",
+                            response_id="final_custom_0",
+                            metadata={"batch": True},
+                        )
+                    ],
+                )
+            ],
+            "final-batch-uuid-1": [
+                BatchResult(status="error", raw_output="err", parsed_responses=None)
+            ],
+        }
+        assert temp_datastore.finalize_batches(results_by_uuid) == {}
+
+        assert temp_datastore.get_all_pending_batch_uuids() == []
+        assert temp_datastore.retrieve(call_ids[0]).text == "Final response 0"
+        assert temp_datastore.retrieve(call_ids[1]) is None
+
+    def test_finalize_batches_isolates_bad_batch(self, temp_datastore):
+        """A batch with an unknown custom_id does not roll back the others"""
+        call_ids = [
+            {
+                "agent_name": "iso_agent",
+                "doc_hash": f"iso_hash_{i}",
+                "seq_id": i,
+                "session_id": 451,
+                "provider_type": "openai",
+            }
+            for i in range(3)
+        ]
+        temp_datastore.store_pending_batch_many(
+            [
+                BatchIdentifier(
+                    call_ids=[call_id],
+                    custom_ids=[f"iso_custom_{i}"],
+                    batch_uuid=f"iso-batch-{i}",
+                )
+                for i, call_id in enumerate(call_ids)
+            ]
+        )
+
+        def ready(custom_id):
+            return [
+                BatchResult(
+                    status="ready",
+                    raw_output="ok",
+                    parsed_responses=[
+                        ParsedResponse(
+                            text=f"text {custom_id}",
+                            response_id=custom_id,
+                            metadata=None,
+                        )
+                    ],
+                )
+            ]
+
+        failed = temp_datastore.finalize_batches(
+            {
+                "iso-batch-0": ready("iso_custom_0"),
+                "iso-batch-1": ready("unknown_custom"),
+                "iso-batch-2": ready("iso_custom_2"),
+            }
+        )
+
+        assert list(failed) == ["iso-batch-1"]
+        assert temp_datastore.get_all_pending_batch_uuids() == ["iso-batch-1"]
+        assert temp_datastore.retrieve(call_ids[0]).text == "text iso_custom_0"
+        assert temp_datastore.retrieve(call_ids[1]) is None
+        assert temp_datastore.retrieve(call_ids[2]).text == "text iso_custom_2"
+
     def test_empty_batch_handling(self, temp_datastore):
         """Test handling of empty batch results"""
         batch_result = BatchResult(
@@ -0,0 +1,109 @@
+"""
+Tests for the Parquet sink
+"""
+
+import polars as pl
+
+from parallellm.core.sink.to_parquet import ParquetWriter, write_to_parquet
+
+
+def test_append_new_file(tmp_path):
+    fpath = tmp_path / "sub" / "table.parquet"
+    write_to_parquet(fpath, [{"id": "a", "n": 1}])
+
+    assert pl.read_parquet(fpath).to_dicts() == [{"id": "a", "n": 1}]
+    assert not fpath.with_suffix(".tmp").exists()
+
+
+def test_append_existing_file(tmp_path):
+    """Appending keeps existing rows and fills missing columns with nulls"""
+    fpath = tmp_path / "table.parquet"
+    write_to_parquet(fpath, [{"id": "a", "n": 1}])
+    write_to_parquet(fpath, [{"id": "b", "extra": "x"}])
+
+    assert pl.read_parquet(fpath).to_dicts() == [
+        {"id": "a", "n": 1, "extra": None},
+        {"id": "b", "n": None, "extra": "x"},
+    ]
+
+
+def test_unique_skips_existing_keys(tmp_path):
+    fpath = tmp_path / "table.parquet"
+    write_to_parquet(fpath, [{"id": "a", "n": 1}])
+    receipt = write_to_parquet(
+        fpath,
+        [{"id": "a", "n": 2}, {"id": "b", "n": 3}],
+        mode="unique",
+        on=["id"],
+        receipt_col="id",
+    )
+
+    assert receipt["id"].to_list() == ["b"]
+    assert pl.read_parquet(fpath).to_dicts() == [
+        {"id": "a", "n": 1},
+        {"id": "b", "n": 3},
+    ]
+
+
+def test_update_and_replace(tmp_path):
+    fpath = tmp_path / "table.parquet"
+    write_to_parquet(fpath, [{"id": "a", "n": 1}, {"id": "b", "n": 2}])
+
+    write_to_parquet(fpath, [{"id": "b", "n": 5}], mode="update", on=["id"])
+    assert pl.read_parquet(fpath)["n"].to_list() == [1, 5]
+
+    write_to_parquet(fpath, [{"id": "c", "n": 0}], mode="replace")
+    assert pl.read_parquet(fpath).to_dicts() == [{"id": "c", "n": 0}]
+
+
+def test_writer_commit_and_get(tmp_path):
+    writer = ParquetWriter(tmp_path / "index.parquet")
+    writer.log({"response_id": "r1", "seq_id": 0})
+    writer.log({"response_id": "r2", "seq_id": 1})
+    receipt = writer.commit(mode="append", receipt_col="response_id")
+
+    assert receipt["response_id"].to_list() == ["r1", "r2"]
+    assert writer.get({"seq_id": 1})["response_id"].to_list() == ["r2"]
+
+
+def test_writer_get_matches_nulls(tmp_path):
+    writer = ParquetWriter(tmp_path / "index.parquet")
+    writer.write(
+        [
+            {"response_id": "r1", "agent_name": None, "seq_id": 0},
+            {"response_id": "r2", "agent_name": "a", "seq_id": 0},
+        ],
+        mode="append",
+    )
+
+    assert writer.get({"agent_name": None, "seq_id": 0})["response_id"].to_list() == [
+        "r1"
+    ]
+    assert writer.get({"agent_name": "a", "seq_id": 0})["response_id"].to_list() == [
+        "r2"
+    ]
+    assert writer.get({"agent_name": "b"}).is_empty()
+
+
+def test_writer_get_limit(tmp_path):
+    writer = ParquetWriter(tmp_path / "index.parquet")
+    writer.write(
+        [{"response_id": f"r{i}", "seq_id": 0} for i in range(3)], mode="append"
+    )
+
+    assert writer.get({"seq_id": 0}).height == 3
+    assert writer.get({"seq_id": 0}, limit=1)["response_id"].to_list() == ["r0"]
+
+
+def test_writer_get_columns(tmp_path):
+    writer = ParquetWriter(tmp_path / "index.parquet")
+    writer.write([{"response_id": "r1", "seq_id": 0, "extra": "x"}], mode="append")
+
+    assert writer.get({"seq_id": 0}, columns=["response_id"]).to_dicts() == [
+        {"response_id": "r1"}
+    ]
+
+
+def test_writer_slots(tmp_path):
+    writer = ParquetWriter(tmp_path / "index.parquet")
+    assert not hasattr(writer, "__dict__")
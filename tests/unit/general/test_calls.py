@@ -0,0 +1,54 @@
+"""
+Tests for call identifier helpers
+"""
+
+from parallellm.core.calls import (
+    _call_key,
+    _call_matches,
+    _call_to_concise_dict,
+    _concise_dict_to_call,
+)
+
+
+def _call(agent_name="agent", doc_hash="hash", seq_id=0, session_id=1):
+    return {
+        "agent_name": agent_name,
+        "doc_hash": doc_hash,
+        "seq_id": seq_id,
+        "session_id": session_id,
+        "provider_type": "openai",
+    }
+
+
+def test_call_key():
+    assert _call_key(_call()) == ("agent", "hash", 0)
+
+
+def test_call_matches_ignores_session():
+    assert _call_matches(_call(session_id=1), _call(session_id=2))
+
+
+def test_call_matches_differs():
+    assert not _call_matches(_call(), _call(agent_name=None))
+    assert not _call_matches(_call(), _call(doc_hash="other"))
+    assert not _call_matches(_call(), _call(seq_id=1))
+
+
+def test_concise_dict_roundtrip():
+    call = _call()
+    restored = _concise_dict_to_call(_call_to_concise_dict(call))
+    assert restored == {
+        "agent_name": "agent",
+        "doc_hash": "hash",
+        "seq_id": 0,
+        "session_id": None,
+        "provider_type": None,
+    }
+    assert _call_matches(restored, call)
+
+
+def test_concise_dict_keeps_values():
+    """Present keys are not overwritten by the defaults"""
+    restored = _concise_dict_to_call(_call(session_id=3))
+    assert restored["session_id"] == 3
+    assert restored["provider_type"] == "openai"
@@ -0,0 +1,81 @@
+"""
+Tests for the JSON serialization helper
+"""
+
+import json
+import math
+
+import pytest
+
+from parallellm.utils import fastjson
+from parallellm.utils.fastjson import dumps_bytes
+
+
+def test_roundtrip():
+    """Output is compact UTF-8 JSON"""
+    obj = {"custom_id": "c1", "body": {"input": ["héllo", 1, 2.5, None, True]}}
+    out = dumps_bytes(obj)
+
+    assert isinstance(out, bytes)
+    assert json.loads(out) == obj
+    assert b", " not in out
+
+
+def test_stdlib_fallback(monkeypatch):
+    """Without orjson, the standard library gives the same output"""
+    obj = {"a": [1, "é"], "b": {"c": None}}
+    expected = dumps_bytes(obj)
+
+    monkeypatch.setattr(fastjson, "HAS_ORJSON", False)
+    assert dumps_bytes(obj) == expected
+
+
+def test_non_str_keys():
+    """Keys that orjson rejects still serialize"""
+    assert json.loads(dumps_bytes({1: "x"})) == {"1": "x"}
+
+
+def test_dumps_loads(monkeypatch):
+    """String helpers roundtrip with and without orjson"""
+    obj = [["f", {"x": "é"}, "c1"]]
+    assert fastjson.loads(fastjson.dumps(obj)) == obj
+
+    monkeypatch.setattr(fastjson, "HAS_ORJSON", False)
+    assert fastjson.loads(fastjson.dumps(obj)) == obj
+
+
+def test_loads_nan():
+    """NaN/Infinity written by the standard library still decode"""
+    out = fastjson.loads(json.dumps({"x": float("nan"), "y": float("inf")}))
+    assert math.isnan(out["x"])
+    assert out["y"] == float("inf")
+
+
+def test_orjson_matches_stdlib(monkeypatch):
+    """orjson and the standard library give the same output"""
+    pytest.importorskip("orjson")
+    obj = {"a": [1, "é", 2.5], "b": {"c": None}, "d": True}
+    out = dumps_bytes(obj)
+
+    monkeypatch.setattr(fastjson, "HAS_ORJSON", False)
+    assert dumps_bytes(obj) == out
+
+
+def test_orjson_non_finite(monkeypatch):
+    """NaN/Infinity are not turned into null by orjson"""
+    pytest.importorskip("orjson")
+    obj = {"x": [float("nan")], "y": float("-inf"), "z": None}
+    out = dumps_bytes(obj)
+    assert out == b'{"x":[NaN],"y":-Infinity,"z":null}'
+
+    decoded = fastjson.loads(out)
+    assert math.isnan(decoded["x"][0])
+    assert decoded["y"] == float("-inf")
+    assert decoded["z"] is None
+
+
+def test_orjson_non_str_keys():
+    """Keys that orjson rejects fall back to the standard library"""
+    pytest.importorskip("orjson")
+    assert fastjson.HAS_ORJSON
+    assert dumps_bytes({1: "x", "a": {2: [1.5]}}) == b'{"1":"x","a":{"2":[1.5]}}'
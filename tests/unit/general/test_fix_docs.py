@@ -0,0 +1,21 @@
+"""
+Tests for document casting
+"""
+
+from parallellm.core.cast.fix_docs import cast_documents
+
+
+def test_single_document():
+    assert cast_documents("doc") == ["doc"]
+
+
+def test_additional_documents():
+    assert cast_documents(["a", "b"], ["c"]) == ["a", "b", "c"]
+    assert cast_documents("a", ["b"]) == ["a", "b"]
+
+
+def test_returns_new_list():
+    documents = ["a"]
+    result = cast_documents(documents)
+    result.append("b")
+    assert documents == ["a"]
@@ -0,0 +1,33 @@
+"""
+Tests for tool call (de)serialization
+"""
+
+from parallellm.core.cast.fix_tools import dump_tool_calls, load_tool_calls
+from parallellm.types import ToolCall
+
+
+def test_roundtrip():
+    """Tool calls survive a dump/load cycle"""
+    calls = [
+        ToolCall(name="get_weather", arguments={"city": "Zürich"}, call_id="c1"),
+        ToolCall(name="noop", arguments="{}", call_id="c2"),
+    ]
+    data = dump_tool_calls(calls)
+    assert isinstance(data, str)
+
+    loaded = load_tool_calls(data)
+    assert [(c.name, c.args, c.call_id) for c in loaded] == [
+        (c.name, c.args, c.call_id) for c in calls
+    ]
+    assert [c.arg_str for c in loaded] == [c.arg_str for c in calls]
+
+
+def test_none():
+    assert dump_tool_calls(None) is None
+
+
+def test_load_legacy_format():
+    """Data written with the previous (spaced) separators still loads"""
+    data = '[["f", {"x": 1}, "c1"]]'
+    (call,) = load_tool_calls(data)
+    assert (call.name, call.args, call.call_id) == ("f", {"x": 1}, "c1")
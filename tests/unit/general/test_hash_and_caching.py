@@ -80,6 +80,20 @@ class TestComputeHash:
         with pytest.raises(ValueError, match="Unsupported document type"):
             compute_hash(instructions, documents)
 
+    def test_hash_subclass(self):
+        """Test that subclasses of supported types hash like their base type"""
+
+        class MyStr(str):
+            pass
+
+        assert compute_hash("sub", [MyStr("doc")]) == compute_hash("sub", ["doc"])
+
+    def test_hash_tuple_length(self):
+        """Test that only (role, content) tuples are supported"""
+        assert len(compute_hash(None, [("user", "hi")])) == 64
+        with pytest.raises(ValueError, match="Unsupported document type"):
+            compute_hash(None, [("user", "hi", "extra")])
+
     def test_hash_manual_verification(self):
         """Test hash computation with manual verification"""
         instructions = "manual test"
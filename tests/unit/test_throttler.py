@@ -146,3 +146,34 @@ class TestThrottler:
         assert config["max_requests_per_minute"] is None
         assert config["enabled"] is False
         assert config["current_request_count"] == 0
+
+    def test_acquire_waits_for_window(self):
+        """Test that acquire blocks once the window is full"""
+        throttler = Throttler(max_requests_per_window=2, window_seconds=0.2)
+
+        start = time.time()
+        for _ in range(3):
+            throttler.acquire()
+        elapsed = time.time() - start
+
+        assert elapsed >= 0.15
+        assert throttler.get_current_request_count() <= 2
+
+    def test_acquire_concurrent(self):
+        """Test that concurrent acquires never exceed the limit"""
+        throttler = Throttler(max_requests_per_window=3, window_seconds=0.2)
+        acquired = []
+
+        def worker():
+            throttler.acquire()
+            acquired.append(time.time())
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        acquired.sort()
+        # The 4th acquisition must wait for the 1st to leave the window
+        assert acquired[3] - acquired[0] >= 0.15